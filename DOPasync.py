@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+""" Asyncio API for loading many BDD-files concurrently
+
+Usage
+=====
+    ``await DOP.aload_many(paths)`` reads the BDD-files in `paths` and returns
+    the list of `DOPBase` instances in the order of `paths` (a path given
+    twice is read twice).
+    ``async for path, dop in DOP.aload_iter(paths)`` yields them as soon as
+    they are read.
+
+    The files are read by the `DOP` function on a bounded thread pool, so the
+    disk I/O and the decompression of *.gz and *.bz2-archives of several files
+    overlap. The memory of the files being read and of the instances that were
+    not yet taken by the caller is limited by the `maxMemory` argument: no new
+    file is started while the limit would be exceeded.
+    `aload_many` keeps all instances until the list is returned, so their
+    memory stays reserved and a MemoryError is raised if the next file does
+    not fit into `maxMemory` next to them. `aload_iter` releases the memory
+    of an instance when the next one is requested.
+
+    This module requires Python 3.7 or newer. The functions are available as
+    attributes of the `DOP` function of the `DOPpy` module.
+"""
+
+import os
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+
+def availableMemory():
+    """ Returns half of the available physical memory in bytes
+
+    Returns None if the available memory cannot be determined.
+    """
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') // 2
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def estimateMemory(path, expansion=8):
+    """ Returns the estimated memory of a read BDD-file in bytes
+
+    The profiles are stored as 1 or 2-byte integers in the file and are
+    converted to float arrays, so the memory is estimated as `expansion`
+    times the file size. Compressed archives are assumed to expand by a
+    factor 4 when decompressed.
+    """
+    size = os.path.getsize(path)
+    if path.endswith('.bz2') or path.endswith('.gz'):
+        size *= 4
+    return size * expansion
+
+
+def nbytes(dop):
+    """ Returns the memory of the arrays stored in a `DOPBase` instance """
+    return sum(v.nbytes for v in dop._values.values()
+               if isinstance(v, np.ndarray))
+
+
+
+class _MemoryBudget(object):
+    """ Reservations of memory that wait while a limit would be exceeded
+
+    A reservation larger than the limit is granted if nothing else is
+    reserved, so single large files can still be read. Reservations marked
+    as kept are never released, a reservation that does not fit next to
+    them raises a MemoryError instead of waiting forever.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.used = 0
+        self.kept = 0
+        self._cond = asyncio.Condition()
+
+
+    async def acquire(self, n):
+        async with self._cond:
+            if self.limit is not None:
+                await self._cond.wait_for(
+                    lambda: self.used == self.kept or
+                            self.used + n <= self.limit)
+                if self.kept and self.used + n > self.limit:
+                    raise MemoryError(
+                        'The kept instances ({:d} bytes) and the next file '
+                        '({:d} bytes) exceed maxMemory ({:d} bytes)'.format(
+                            self.kept, n, self.limit))
+            self.used += n
+
+
+    async def release(self, n):
+        async with self._cond:
+            self.used -= n
+            self._cond.notify_all()
+
+
+    async def keep(self, n):
+        async with self._cond:
+            self.kept += n
+            self._cond.notify_all()
+
+
+
+async def aload_iter(paths, workers=4, maxMemory='auto', expansion=None,
+                     **kw):
+    """ Read BDD-files concurrently and yield them as they finish
+
+    This is an asynchronous generator yielding tuples ``(path, dop)`` in the
+    order the files finish, where `dop` is the `DOPBase` instance returned
+    by ``DOP(path, **kw)``.
+
+    Arguments:
+    ==========
+    paths: list
+        Paths to the BDD-files.
+    workers: int
+        Maximum number of files read at the same time.
+    maxMemory: int, 'auto' or None
+        Limit of the estimated memory in bytes of the files being read and
+        of the instances that were not yet requested from the generator. The
+        memory of an instance is released from the limit when the next
+        instance is requested (`aload_many` keeps it, see there).
+        ``'auto'`` uses half of the available
+        physical memory (see `availableMemory`), None disables the limit.
+    expansion: float or None
+        Ratio of memory to file size used to estimate the memory of a file
+        before it is read (see `estimateMemory`). If None, 8 is used, or 1
+        if the profiles are not decoded (``loadMeas=False``).
+
+    All other keyword arguments are passed to the `DOP` function.
+    """
+    gen = _aload(paths, workers, maxMemory, expansion, False, **kw)
+    try:
+        async for i, path, dop in gen:
+            yield path, dop
+    finally:
+        await gen.aclose()
+
+
+async def _aload(paths, workers, maxMemory, expansion, keep, **kw):
+    """ Same as `aload_iter`, yields ``(index, path, dop)`` with the index
+    of the path in `paths`
+
+    If `keep` is True, the memory of the yielded instances stays reserved.
+    """
+    if maxMemory == 'auto':
+        maxMemory = availableMemory()
+    if expansion is None:
+        expansion = 8 if kw.get('loadMeas', True) else 1
+
+    # imported here, `DOPpy` imports this module at its end
+    import DOPpy
+
+    loop = asyncio.get_running_loop()
+    budget = _MemoryBudget(maxMemory)
+    ex = ThreadPoolExecutor(workers)
+
+    async def load(i, path):
+        estimate = estimateMemory(path, expansion)
+        await budget.acquire(estimate)
+        try:
+            dop = await loop.run_in_executor(
+                ex, functools.partial(DOPpy.DOP, path, **kw))
+        except BaseException:
+            await budget.release(estimate)
+            raise
+
+        # replace the estimate by the memory of the instance (without
+        # waiting, the memory is already used)
+        used = nbytes(dop)
+        await budget.release(estimate - used)
+        return i, path, dop, used
+
+    tasks = [asyncio.ensure_future(load(i, p)) for i, p in enumerate(paths)]
+    try:
+        for fut in asyncio.as_completed(tasks):
+            i, path, dop, used = await fut
+            if keep:
+                await budget.keep(used)
+                yield i, path, dop
+            else:
+                yield i, path, dop
+                await budget.release(used)
+    finally:
+        for task in tasks:
+            task.cancel()
+        # files being read are finished by the threads in the background
+        ex.shutdown(wait=False)
+
+
+async def aload_many(paths, workers=4, maxMemory='auto', expansion=None,
+                     **kw):
+    """ Read BDD-files concurrently
+
+    Returns the list of `DOPBase` instances in the order of `paths`. All
+    instances are kept until every file is read, use `aload_iter` to process
+    large sets of files one by one. See `aload_iter` for the arguments.
+
+    The memory of the kept instances stays reserved, so `maxMemory` limits
+    the memory of the returned list. A MemoryError is raised if the next
+    file does not fit into `maxMemory` next to the kept instances.
+    """
+    dops = [None] * len(paths)
+    gen = _aload(paths, workers, maxMemory, expansion, True, **kw)
+    try:
+        async for i, path, dop in gen:
+            dops[i] = dop
+    finally:
+        await gen.aclose()
+    return dops
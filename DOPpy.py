@@ -1,8 +1,8 @@
 # -*- coding: utf-8 -*-
 """ Classes for reading BDD-files of DOP 2000 and 3000/3010
 
-| Version: 2.12
-| Date: 2020-02-01
+| Version: 2.13
+| Date: 2026-10-18
 
 Usage
 =====
@@ -10,6 +10,10 @@ Usage
     BDD-file `fname`. The function determines which version (DOP2000 or 3000)
     the file is and returns a `DOP2000` or `DOP3000` instance, respectively.
 
+    Many files can be read concurrently with ``await DOP.aload_many(paths)``
+    or ``async for path, dop in DOP.aload_iter(paths)`` (Python 3.7 or newer,
+    see module `DOPasync`).
+
 Getting Parameters
 ==================
     These classes have all available informations from the read file stored.
@@ -40,6 +44,13 @@ Getting Parameters
     * ``DOPBase.getChannelParam(param, channel)`` returns the value of the
       channel-specific parameter given in `param` of the channel (see
       `DOPBase.keysChannel`).
+    * ``DOPBase.read_window(t0, t1, channel, profile)`` returns the timestamps
+      and the profiles of type `profile` of the channel within the time
+      window from `t0` to `t1` in s. Only the measurement blocks inside the
+      window are decoded if the file was read with ``loadMeas=False``.
+    * ``DOPBase.pyramid(channel)`` returns the velocity of the channel at
+      several decimation levels for zoomable overviews of long
+      measurements. The levels are cached in a file next to the BDD-file.
 
     For all these methods `channel` can be an integer or a list of integers. In
     the latter case a list of values is returned. If `channel` is omitted or
@@ -47,6 +58,10 @@ Getting Parameters
     `DOPBase.getChannels`). These methods raise an error if the data is not
     available for at least one requested channel.
 
+    * ``DOPBase.toSharedMemory()`` copies the arrays into a shared memory
+      segment and returns a picklable handle. ``handle.attach()`` returns the
+      instance with views of the segment in any process.
+
     * ``DOPBase.printSettings(channel)`` prints relevant operation parameters
       that were used during the measurement with the given channel. The
       mandatory argument `channel` is an integer.
@@ -69,6 +84,15 @@ Displaying Measurements
     raise an error if the data is not available for at least one requested
     channel.
 
+Following a Recording
+=====================
+    ``TailReader(fname)`` follows a BDD-file that is still being written by
+    the DOP. ``TailReader.poll()`` returns the profiles of the measurement
+    blocks completed since the last call and ``TailReader.follow()`` yields
+    them as they are written. ``replayBDD(src, dst)`` writes an existing
+    BDD-file block by block at the pace of its timestamps to simulate a
+    recording.
+
 
 Notes
 =====
@@ -128,17 +152,378 @@ v2.12:
     * The `DOPBase.printSettings` method now also prints parameters resulting
       from the operation parameters (maximum velocity and depth). A spelling
       error in the output was corrected.
+v2.13:
+    * The offsets of the measurement blocks of every channel are stored in
+      the channel parameter ``'measOffset'`` while scanning the file.
+    * Added the `loadMeas` argument to skip decoding of the measurement
+      blocks when reading the file and the `DOPBase.read_window` method to
+      decode only the measurement blocks inside a time window.
+    * Added the `workers` argument to process the channels concurrently on a
+      thread pool. The offset correction of the velocity and echo is done
+      inplace without temporary float arrays.
+    * `DOPBase.replay` redraws only the animated artists (blitting), skips
+      profiles to keep the requested fps, computes the running average from
+      a running sum and can render the animation to a video file (`saveAs`).
+    * `DOPBase.contour` aggregates bins of timesteps (`reduction`) instead of
+      selecting every n-th timestep, does not create a meshgrid any more and
+      caches the reduced data of the last 16 calls.
+    * Added `DOPBase.pyramid`, a multi-resolution cache of the velocity
+      profiles stored next to the BDD-file (`VeloPyramid`), and the
+      `xlimits` argument of `DOPBase.contour`, which uses it.
+    * Added ``DOP.aload_many`` and ``DOP.aload_iter`` (Python 3.7 or newer)
+      to read many files concurrently with asyncio (see module `DOPasync`).
+    * Added `DOPBase.toSharedMemory` to pass parsed measurements between
+      processes without copying the arrays (see `SharedDOP`).
+    * The parameters are stored in a `ParamStore`, which keeps records per
+      channel and columns per measurement parameter instead of one
+      dictionary entry per parameter name. Lookups of a parameter name take
+      constant time and `DOPBase.keysChannel` does not search all keys.
+    * Added the columnar mode ``saveMeas='columnar'``, which stores the
+      parameters of the measurement blocks as typed arrays (see
+      `DOPBase.getMeasColumn`) and the file offsets of the profile data
+      instead of copies (see `DOPBase.readMeasData`).
+    * Added `TailReader` to read the measurement blocks of a file that is
+      still being recorded and `replayBDD` to simulate a recording.
+    * `VeloPyramid` keeps its levels in memory if the directory of the
+      BDD-file is not writable. `DOPBase.pyramid` caches one pyramid per
+      combination of its arguments.
+    * Added `DOPBase.iterProfiles` to read the profiles of a channel in
+      chunks from one open file and `DOPBase.sampleProfiles` to read
+      profiles at given indices in one pass over the file.
+    * Added `reduceMaxAbs`, the max-abs reduction shared by the contour
+      plots, `VeloPyramid` and the GUI.
 """
 
 
 from __future__ import division  # supports true division for Python 2.7
 
+import os
+import re
+import errno
+import sys
+import json
 import struct
 from warnings import warn
+from time import sleep
+from collections import OrderedDict
+from timeit import default_timer
 import numpy as np
 import bz2
 import gzip
 import matplotlib.pyplot as plt
+try:
+    from collections.abc import MutableMapping
+except ImportError:  # Python 2.7
+    from collections import MutableMapping
+
+
+_MISSING = object()  # marks unset entries of `ParamStore`
+
+
+
+class _ChannelRecord(object):
+    """ Parameters of one channel
+
+    The frequently used parameters are slots of the record, all other
+    parameters are kept in the dictionary `params`.
+    """
+    __slots__ = ('time', 'depthFile', 'depthCalc', 'velo', 'echo', 'measN',
+                 'measOffset', 'gateN', 'veloMax', 'echoMax', 'profTypeName',
+                 'triggerState', 'params')
+    _fields = frozenset(__slots__[:-1])
+
+    def __init__(self):
+        for name in self._fields:
+            setattr(self, name, _MISSING)
+        self.params = {}
+
+
+    def get(self, name):
+        if name in self._fields:
+            return getattr(self, name)
+        return self.params.get(name, _MISSING)
+
+
+    def set(self, name, value):
+        if name in self._fields:
+            setattr(self, name, value)
+        else:
+            self.params[name] = value
+
+
+    def names(self):
+        return ([name for name in self.__slots__[:-1]
+                 if getattr(self, name) is not _MISSING] + list(self.params))
+
+
+
+class _MeasColumn(object):
+    """ Values of one measurement parameter indexed by measurement number
+
+    The values are kept in a list or, if `typed` is True, in a NumPy array
+    with a boolean mask of the set entries. The array starts with the type
+    of the first value and is promoted if necessary. Values that are not
+    numbers are kept in an object array.
+    """
+    __slots__ = ('typed', 'values', 'valid')
+
+    def __init__(self, typed=False):
+        self.typed = typed
+        self.values = None if typed else []
+        self.valid = None
+
+
+    def get(self, i):
+        if not self.typed:
+            return self.values[i] if i < len(self.values) else _MISSING
+        if self.values is None or i >= len(self.values) or not self.valid[i]:
+            return _MISSING
+        value = self.values[i]
+        return value if self.values.dtype == object else value.item()
+
+
+    def set(self, i, value):
+        if not self.typed:
+            if i >= len(self.values):
+                self.values.extend([_MISSING] * (i+1-len(self.values)))
+            self.values[i] = value
+            return
+
+        v = np.asarray(value)
+        dtype = v.dtype if v.ndim == 0 and v.dtype.kind in 'biuf' else object
+        if self.values is None:
+            self.values = np.zeros(max(i+1, 16), dtype=dtype)
+            self.valid = np.zeros(len(self.values), dtype=bool)
+        elif i >= len(self.values):
+            # grow by doubling
+            n = max(i+1, 2*len(self.values))
+            self.values = np.concatenate(
+                [self.values, np.zeros(n-len(self.values), self.values.dtype)])
+            self.valid = np.concatenate(
+                [self.valid, np.zeros(n-len(self.valid), dtype=bool)])
+        if dtype != self.values.dtype:
+            if dtype == object or self.values.dtype == object:
+                dtype = object
+            else:
+                dtype = np.promote_types(self.values.dtype, dtype)
+            self.values = self.values.astype(dtype)
+        self.values[i] = value
+        self.valid[i] = True
+
+
+    def delete(self, i):
+        if self.typed:
+            self.valid[i] = False
+        else:
+            self.values[i] = _MISSING
+
+
+    def indices(self):
+        """ Returns the indices of the set values """
+        if not self.typed:
+            return [i for i, v in enumerate(self.values) if v is not _MISSING]
+        elif self.values is None:
+            return []
+        return np.flatnonzero(self.valid).tolist()
+
+
+    def compact(self):
+        """ Trim the array and use the smallest integer type for integers """
+        if not self.typed or self.values is None:
+            return
+        used = np.flatnonzero(self.valid)
+        n = used[-1] + 1 if len(used) else 0
+        self.values = self.values[:n].copy()
+        self.valid = self.valid[:n].copy()
+        if self.values.dtype.kind in 'iu' and n > 0:
+            used = self.values[self.valid]
+            dtype = np.result_type(np.min_scalar_type(used.min()),
+                                   np.min_scalar_type(used.max()))
+            self.values = self.values.astype(dtype)
+
+
+    def array(self):
+        """ Returns the values as masked array """
+        if self.typed:
+            if self.values is None:
+                return np.ma.masked_array([])
+            return np.ma.masked_array(self.values, mask=~self.valid)
+        valid = np.array([v is not _MISSING for v in self.values], dtype=bool)
+        values = [v if ok else 0 for v, ok in zip(self.values, valid)]
+        return np.ma.masked_array(values, mask=~valid)
+
+
+
+class ParamStore(MutableMapping):
+    """ Structured storage of the parameters of a `DOPBase` instance
+
+    The store is a mapping with the flat parameter names as keys (e.g.
+    ``'prf'``, ``'ch3_velo'`` or ``'meas12_prof2_type'``), but the names are
+    split into their parts and stored separately:
+
+    * Global parameters are kept in a dictionary.
+    * Channel parameters (``'ch<n>_<name>'``) are kept in one record per
+      channel (see `_ChannelRecord`). The parameters of a channel are listed
+      without searching all keys (see `ParamStore.channelKeys`).
+    * Measurement parameters (``'meas<n>_<name>'`` and
+      ``'meas<n>_prof<m>_<name>'``, see the `saveMeas` argument of `DOP`)
+      are kept in one column per name and profile, indexed by the
+      measurement number (see `_MeasColumn`). No key strings are stored for
+      them. If `measArrays` is True, the columns are typed NumPy arrays.
+      `ParamStore.setMeas` writes to a column without building a key.
+
+    All lookups only parse the requested key and take constant time, parsed
+    keys are memoised.
+    """
+
+    def __init__(self, *args, **kw):
+        self._measArrays = kw.pop('measArrays', False)
+        self._global = {}
+        self._channels = {}  # channel number: _ChannelRecord
+        self._meas = {}  # (profile number or None, name): _MeasColumn
+        self._parsed = {}  # parsed parameter names
+        self.update(*args, **kw)
+
+
+    def _parseKey(self, key):
+        """ Split a parameter name into (kind, number, profile, name)
+
+        `kind` is ``'ch'``, ``'meas'`` or None for global parameters.
+        """
+        parsed = self._parsed.get(key)
+        if parsed is None:
+            parsed = self._parsed[key] = self._splitKey(key)
+        return parsed
+
+
+    # numbers formatted as by `DOPBase._prefixChannel` etc.
+    _keyPattern = re.compile(
+        r'(ch|meas)([1-9][0-9]*)_(?:prof(0|[1-9][0-9]*)_)?(.+)\Z', re.S)
+
+    @classmethod
+    def _splitKey(cls, key):
+        """ See `ParamStore._parseKey` """
+        match = cls._keyPattern.match(key)
+        if match is None:
+            return None, None, None, key
+        kind, num, prof, name = match.groups()
+        if prof is not None:
+            if kind == 'ch':
+                # profiles are only part of measurement parameter names
+                return kind, int(num), None, key[len(kind+num)+1:]
+            prof = int(prof)
+        return kind, int(num), prof, name
+
+
+    def _get(self, key):
+        kind, num, prof, name = self._parseKey(key)
+        if kind == 'ch':
+            rec = self._channels.get(num)
+            return _MISSING if rec is None else rec.get(name)
+        elif kind == 'meas':
+            col = self._meas.get((prof, name))
+            return _MISSING if col is None else col.get(num-1)
+        return self._global.get(key, _MISSING)
+
+
+    def __getitem__(self, key):
+        value = self._get(key)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+
+    def __contains__(self, key):
+        return self._get(key) is not _MISSING
+
+
+    def __setitem__(self, key, value):
+        kind, num, prof, name = self._parseKey(key)
+        if kind == 'ch':
+            rec = self._channels.get(num)
+            if rec is None:
+                rec = self._channels[num] = _ChannelRecord()
+            rec.set(name, value)
+        elif kind == 'meas':
+            self.setMeas(num, name, value, prof)
+        else:
+            self._global[key] = value
+
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        kind, num, prof, name = self._parseKey(key)
+        if kind == 'ch':
+            rec = self._channels[num]
+            if name in rec._fields:
+                setattr(rec, name, _MISSING)
+            else:
+                del rec.params[name]
+        elif kind == 'meas':
+            self._meas[(prof, name)].delete(num-1)
+        else:
+            del self._global[key]
+
+
+    def __iter__(self):
+        for key in self._global:
+            yield key
+        for ch, rec in self._channels.items():
+            for name in rec.names():
+                yield 'ch{:d}_{}'.format(ch, name)
+        for (prof, name), col in self._meas.items():
+            if prof is None:
+                fmt = 'meas{:d}_' + name
+            else:
+                fmt = 'meas{:d}_prof' + str(prof) + '_' + name
+            for i in col.indices():
+                yield fmt.format(i+1)
+
+
+    def __len__(self):
+        n = len(self._global)
+        n += sum(len(rec.names()) for rec in self._channels.values())
+        n += sum(len(col.indices()) for col in self._meas.values())
+        return n
+
+
+    def channelKeys(self, channel):
+        """ Returns the names of the parameters of a channel (without prefix)
+        """
+        rec = self._channels.get(channel)
+        return [] if rec is None else rec.names()
+
+
+    def setMeas(self, meas, name, value, profile=None):
+        """ Set a measurement parameter
+
+        Same as ``store['meas<meas>_prof<profile>_<name>'] = value`` (without
+        the ``'prof<profile>_'`` part if `profile` is None).
+        """
+        col = self._meas.get((profile, name))
+        if col is None:
+            col = self._meas[(profile, name)] = _MeasColumn(self._measArrays)
+        col.set(meas-1, value)
+
+
+    def measColumn(self, name, profile=None):
+        """ Returns the values of a measurement parameter of all measurements
+
+        The masked array is indexed by the measurement number minus 1.
+        Entries of measurements without the parameter are masked.
+        """
+        col = self._meas.get((profile, name))
+        if col is None:
+            raise KeyError(name if profile is None else
+                           'prof{:d}_{}'.format(profile, name))
+        return col.array()
+
+
+    def compact(self):
+        """ Trim the measurement columns and shrink their integer types """
+        for col in self._meas.values():
+            col.compact()
 
 
 
@@ -164,6 +549,7 @@ class DOPBase(object):
         module.
     """
     _codec = 'cp1252'  # file codec
+    _reduceCacheSize = 16  # reduced profiles kept by `DOPBase._reduceTime`
 
     def __init__(self, fname, **kw):
         """ Read a DOP binary file (*.BDD)
@@ -191,10 +577,24 @@ class DOPBase(object):
             These are NOT affected by changes of any parameters (e.g.
             ``'soundSpeed'``). Use the optional argument ``version='Calc'`` to
             get newly calculated depth values in this case.
-        saveMeas: bool
+        saveMeas: bool or 'columnar'
             Save the raw data of the measurement blocks into the returned class
             instance. This may cause a ``MemoryError`` for very large files or
-            may slow down the reading process. Default: False
+            may slow down the reading process. With ``'columnar'`` the
+            parameters of the blocks are stored as typed arrays (see
+            `DOPBase.getMeasColumn`) and the profile data of the blocks are not
+            copied, only their offsets in the file are stored as parameter
+            ``'dataOffset'`` (see `DOPBase.readMeasData`). This needs only a
+            few bytes per block. Default: False
+        loadMeas: bool
+            Decode the profiles of all measurement blocks while reading the
+            file. If False, only the parameters, the timestamps, the trigger
+            states and the offsets of the measurement blocks are read. The profiles can then
+            be retrieved for a time window with `DOPBase.read_window`.
+            Default: True
+        workers: int
+            Number of threads used to process the channels of a multiplexed
+            measurement concurrently after reading. Default: 1
         decode_errors: str
             Error handling of ``UnicodeDecodeError`` during decoding of
             strings. See documentation of the `errors` argument in
@@ -202,32 +602,43 @@ class DOPBase(object):
         """
         self._fname = fname
         self._file = None
-        self._values = {}
         self._replaceParam = kw.pop('replaceParam', {})
         self._saveMeas = kw.pop('saveMeas', False)
+        self._values = ParamStore(measArrays=self._saveMeas == 'columnar')
+        self._loadMeas = kw.pop('loadMeas', True)
+        self._workers = kw.pop('workers', 1)
         self._decode_errors = kw.pop('decode_errors', 'ignore')
+        self._reduceCache = OrderedDict()  # see `DOPBase._reduceTime`
+        self._pyramids = {}  # see `DOPBase.pyramid`
 
-        if self._fname.endswith('.bz2'):
-            self._file = bz2.BZ2File(self._fname, 'rb')
-        elif self._fname.endswith('.gz'):
-            self._file = gzip.GzipFile(self._fname, 'rb')
-        else:
-            self._file = open(self._fname, 'rb')
-
+        self._file = self._openFile()
         self._read()
         self._file.close()
+        if self._saveMeas == 'columnar':
+            self._values.compact()
 
         self._refine()
 
 
+    def _openFile(self):
+        """ Open the BDD file for binary reading and return the file object
+        """
+        if self._fname.endswith('.bz2'):
+            return bz2.BZ2File(self._fname, 'rb')
+        elif self._fname.endswith('.gz'):
+            return gzip.GzipFile(self._fname, 'rb')
+        else:
+            return open(self._fname, 'rb')
+
+
     def _read(self):
         """ Read the data in the given BDD file
         """
         # This method is implemented by subclasses.
         # Use methods `self._readParam` to get a parameter value from the file
-        # (use the ``save=self._saveMeas`` argument for parameters in the
-        # measurement block). Use methods `self.setParam` and `self.getParam`
-        # to modify parameter values.
+        # (use `self._setMeasParam` to save parameters of the measurement
+        # blocks if `self._saveMeas` is set). Use methods `self.setParam` and
+        # `self.getParam` to modify parameter values.
 
         raise Exception('The method "_read" of {} '.format(self.__class__) +
                         'has not been implemented.')
@@ -256,11 +667,26 @@ class DOPBase(object):
         #   'velo'/'echo'/...: All recorded profiles as named in 'profTypeName'
         #   'samplingVolume': Thickness of the sampling volume in millimeter
         #                     May be float('nan') if unknown
+        # If `self._loadMeas` is False, the profiles ('velo'/'echo'/...) are
+        # not defined, but 'veloMax' and 'echoMax' are.
 
         raise Exception('The method "_refine" of {} '.format(self.__class__) +
                         'has not been implemented.')
 
 
+    def _decodeMeas(self, buf, pos):
+        """ Decode the profiles of a measurement block from a buffer
+        """
+        # This method is implemented by subclasses.
+        # `buf` holds the raw bytes of (at least) the measurement block that
+        # starts at the position `pos` inside `buf`. The method returns the
+        # channel number and a dictionary with the raw (unconverted) profile
+        # arrays of the block. The keys are the names in 'profTypeName'.
+
+        raise Exception('The method "_decodeMeas" of ' +
+                        '{} has not been implemented.'.format(self.__class__))
+
+
     def keys(self):
         """ Returns list of available parameters
         """
@@ -309,16 +735,79 @@ class DOPBase(object):
 
         res = []
         for ch in channel:
-            preCh = self._prefixChannel(ch)
-            keys = self.keysSearch(preCh)
-            for k in keys:
-                k = k[len(preCh):]
+            for k in self._values.channelKeys(ch):
                 if k not in res:
                     res.append(k)
 
         return res
 
 
+    def getMeasColumn(self, param, profile=None):
+        """ Returns a parameter of all measurement blocks
+
+        The measurement parameters are only available if the file was read
+        with the `saveMeas` argument.
+
+        Arguments:
+        ==========
+        param: str
+            Parameter name without the prefix ``'meas<n>_'`` (e.g.
+            ``'timeStamp'``).
+        profile: int or None
+            Profile number for parameters of the profiles inside the blocks
+            (DOP3000 only, parameters ``'meas<n>_prof<m>_<param>'``).
+
+        Returns:
+        ========
+        values: masked array
+            Values of the form ``values[meas-1]``. Blocks without the
+            parameter are masked.
+        """
+        return self._values.measColumn(param, profile)
+
+
+    def readMeasData(self, meas, profile=None):
+        """ Returns the raw profile data of a measurement block
+
+        The data is read from the file if it was read with
+        ``saveMeas='columnar'``.
+
+        Arguments:
+        ==========
+        meas: int
+            Measurement number starting at 1.
+        profile: int or None
+            Profile number inside the block (DOP3000 only).
+
+        Returns:
+        ========
+        data: array
+            Raw (unconverted) values of the profile data.
+        """
+        prefix = self._prefixMeas(meas)
+        if profile is not None:
+            prefix += self._prefixProfile(profile)
+
+        offset, count, fmt = self._measDataLayout(meas, profile)
+        if prefix + 'data' in self:
+            return np.array(self.getParam(prefix + 'data'), dtype=fmt)
+
+        f = self._openFile()
+        try:
+            f.seek(offset)
+            buf = f.read(count * struct.calcsize(fmt))
+        finally:
+            f.close()
+        return np.frombuffer(buf, dtype=fmt)
+
+
+    def _measDataLayout(self, meas, profile):
+        """ Returns offset, number and format of the data of a block """
+        # This method is implemented by subclasses.
+        raise Exception('The method "_measDataLayout" of ' +
+                        '{} has not been implemented.'.format(self.__class__))
+
+
     def __contains__(self, key):
         """ Returns whether parameter is available
         """
@@ -340,6 +829,40 @@ class DOPBase(object):
         return 'prof{:d}_'.format(profile)
 
 
+    def _mapChannels(self, fct, channels):
+        """ Call `fct(channel)` for every channel in `channels`
+
+        The calls are distributed over a thread pool if the `workers`
+        argument is larger than 1. The processing of the channels is
+        independent and mostly done by NumPy, which releases the GIL.
+        """
+        if self._workers > 1 and len(channels) > 1:
+            from concurrent.futures import ThreadPoolExecutor
+
+            with ThreadPoolExecutor(min(self._workers, len(channels))) as ex:
+                # consume the results to raise exceptions of the workers
+                list(ex.map(fct, channels))
+        else:
+            for ch in channels:
+                fct(ch)
+
+
+    def _correctVeloOffset(self, data, veloOffset):
+        """ Correct the offset of raw velocity data inplace
+
+        Same as ``data[data+veloOffset > 127] -= 256`` and
+        ``data[data+veloOffset < -128] += 256``, but the comparisons are done
+        without the shifted copy of `data` and a single boolean mask is
+        reused for both corrections. `data` must be a float array.
+        """
+        mask = np.greater(data, 127-veloOffset)
+        np.subtract(data, 256, out=data, where=mask)
+        np.less(data, -128-veloOffset, out=mask)
+        np.add(data, 256, out=data, where=mask)
+
+        return data
+
+
     def _readParam(self, param, offset, fmt, save=True):
         """ Read and return a single parameter from file
 
@@ -409,6 +932,16 @@ class DOPBase(object):
         return self._values[param]
 
 
+    def _setMeasParam(self, meas, param, value, profile=None):
+        """ Set the value of a measurement parameter
+
+        Same as ``self.setParam(self._prefixMeas(meas) + param, value)``
+        (with `self._prefixProfile(profile)` if `profile` is given), but
+        the parameter name is neither built nor parsed.
+        """
+        self._values.setMeas(meas, param, value, profile)
+
+
     def _modParam(self, param, fct):
         """ Modify a parameter value.
 
@@ -620,6 +1153,297 @@ class DOPBase(object):
         return self.getChannelParam('echo', channel)
 
 
+    def read_window(self, t0, t1, channel=None, profile='velo'):
+        """ Returns timestamps and profiles of a time window
+
+        The time window is found by a binary search over the timestamps of
+        the channel. If the profiles were loaded while reading the file, the
+        window is cut from them. Otherwise (see the `loadMeas` argument of
+        the `DOP` function) only the measurement blocks inside the window are
+        read from the file and decoded.
+
+        Arguments:
+        ==========
+        t0: float
+            Start of the time window in s.
+        t1: float
+            End of the time window in s (included).
+        channel: int or list
+            A channel number (1 to 10) or a list of channel numbers. If
+            ``None`` is given all available channels are used.
+        profile: str
+            Profile type to be returned. See `DOPBase.getProfileType` for
+            available options.
+
+        Returns:
+        ========
+        time: array or list
+            Timestamps inside the window in s.
+        data: array or list
+            Profiles inside the window as a 2d-array of the form
+            ``data[time, depth]``.
+            If `channel` is an integer arrays are returned. If `channel` is a
+            list of ints, lists of arrays are returned with each element
+            corresponding to the same element given in `channel`.
+        """
+        if channel is None:
+            channel = self.getChannels()
+
+        if isinstance(channel, (int, np.integer)):
+            return self._readWindow(t0, t1, channel, profile)
+
+        time, data = [], []
+        for ch in channel:
+            t, d = self._readWindow(t0, t1, ch, profile)
+            time.append(t)
+            data.append(d)
+
+        return time, data
+
+
+    def _readWindow(self, t0, t1, channel, profile):
+        """ Returns timestamps and profiles of a time window of one channel
+        """
+        preCh = self._prefixChannel(channel)
+
+        if profile not in self.getProfileType(channel):
+            raise Exception('Profile {!r} was not '.format(profile) +
+                            'recorded in channel {:d}.'.format(channel))
+
+        # binary search of the window in the (monotonic) timestamps
+        time = self.getParam(preCh + 'time')
+        i0 = np.searchsorted(time, t0, side='left')
+        i1 = np.searchsorted(time, t1, side='right')
+
+        return time[i0:i1], self._readProfiles(channel, profile, i0, i1)
+
+
+    def _readProfiles(self, channel, profile, i0, i1, f=None):
+        """ Returns the profiles with the indices `i0` to `i1` of one channel
+
+        The blocks are read from the open file `f`, or from a file opened for
+        this call if `f` is None.
+        """
+        preCh = self._prefixChannel(channel)
+
+        if preCh + profile in self:
+            # profiles were loaded while reading the file
+            return self.getParam(preCh + profile)[i0:i1]
+
+        offsets = self.getParam(preCh + 'measOffset')[i0:i1]
+        data = np.empty((len(offsets), self.getParam(preCh + 'gateN')))
+
+        if len(offsets) > 0:
+            # read all blocks of the window with a single read
+            opened = f is None
+            if opened:
+                f = self._openFile()
+            try:
+                buf = self._readBlocks(f, offsets[0], offsets[-1])
+            finally:
+                if opened:
+                    f.close()
+
+            for ti, offset in enumerate(offsets):
+                _, profiles = self._decodeMeas(buf, offset-offsets[0])
+                data[ti, :] = profiles[profile]
+
+        return self._calcProfiles(data, channel, profile)
+
+
+    def _readBlocks(self, f, first, last):
+        """ Returns the bytes of the measurement blocks from the offset
+        `first` to the end of the block at the offset `last`
+        """
+        _, offsetL, fmtL = self._measLen
+        f.seek(last + offsetL)
+        lastLen = struct.unpack(fmtL, f.read(struct.calcsize(fmtL)))[0]
+        f.seek(first)
+        return f.read(last + lastLen - first)
+
+
+    def _calcProfiles(self, data, channel, profile):
+        """ Converts decoded profiles to velocity or echo amplitude """
+        if profile == 'velo':
+            data, _ = self._calcVelo(data, channel)
+        elif profile == 'echo':
+            data, _ = self._calcEcho(data, channel)
+        return data
+
+
+    def sampleProfiles(self, channel, profile, indices):
+        """ Returns the profiles with the given indices of one channel
+
+        If the profiles were not loaded while reading the file (see the
+        `loadMeas` argument of the `DOP` function), only the measurement
+        blocks of the indices are decoded. They are read in the order of
+        their offsets in one pass over a single file object, e.g. to estimate
+        statistics from evenly spaced profiles.
+
+        Arguments:
+        ==========
+        channel: int
+            Channel number.
+        profile: str
+            Profile type to be returned. See `DOPBase.getProfileType` for
+            available options.
+        indices: array
+            Indices of the profiles.
+
+        Returns:
+        ========
+        data: array
+            Profiles as a 2d-array of the form ``data[index, depth]``.
+        """
+        preCh = self._prefixChannel(channel)
+        indices = np.asarray(indices, dtype=int)
+
+        if preCh + profile in self:
+            return self.getParam(preCh + profile)[indices]
+
+        offsets = self.getParam(preCh + 'measOffset')[indices]
+        data = np.empty((len(offsets), self.getParam(preCh + 'gateN')))
+
+        if len(offsets) > 0:
+            f = self._openFile()
+            try:
+                for ti in np.argsort(offsets, kind='stable'):
+                    buf = self._readBlocks(f, offsets[ti], offsets[ti])
+                    _, profiles = self._decodeMeas(buf, 0)
+                    data[ti, :] = profiles[profile]
+            finally:
+                f.close()
+
+        return self._calcProfiles(data, channel, profile)
+
+
+    def iterProfiles(self, channel, profile, chunkLen, i0=0, i1=None):
+        """ Yields the profiles of one channel in chunks
+
+        The profiles with the indices `i0` to `i1` are returned in chunks of
+        `chunkLen` profiles. If the profiles were not loaded while reading
+        the file (see the `loadMeas` argument of the `DOP` function), the
+        measurement blocks of every chunk are decoded from a single file
+        object that stays open until the generator is finished or closed.
+
+        Arguments:
+        ==========
+        channel: int
+            Channel number.
+        profile: str
+            Profile type to be returned. See `DOPBase.getProfileType` for
+            available options.
+        chunkLen: int
+            Number of profiles per chunk, the last chunk may be shorter.
+        i0, i1: int or None
+            Indices of the first and after the last profile. If `i1` is None,
+            the profiles up to the end are returned.
+
+        Yields:
+        =======
+        data: array
+            Profiles of the chunk as a 2d-array of the form
+            ``data[time, depth]``.
+        """
+        if i1 is None:
+            i1 = len(self.getTime(channel))
+        f = None
+        if self._prefixChannel(channel) + profile not in self:
+            f = self._openFile()
+        try:
+            for c0 in range(i0, i1, chunkLen):
+                yield self._readProfiles(channel, profile, c0,
+                                         min(c0 + chunkLen, i1), f)
+        finally:
+            if f is not None:
+                f.close()
+
+
+    def pyramid(self, channel, factor=4, minTimes=1000, chunkLen=None):
+        """ Returns the velocity pyramid of a channel for zoomable overviews
+
+        The pyramid holds the velocity profiles of the channel (see
+        `DOPBase.getVelocity`) at several decimation levels and is stored as
+        a memory-mapped cache next to the BDD-file. The cache is built in one
+        streaming pass over the profiles if it does not exist or if the file
+        (or the `replaceParam` argument) changed since it was built. See
+        `VeloPyramid` for details.
+
+        Arguments:
+        ==========
+        channel: int
+            Channel number.
+        factor: int
+            Number of timesteps aggregated per level.
+        minTimes: int
+            The coarsest level has no more than `minTimes` timesteps.
+        chunkLen: int or None
+            Number of profiles processed at once while building the cache. It
+            is rounded up to a multiple of the largest bin length. If None,
+            the largest bin length is used.
+        """
+        key = (channel, factor, minTimes, chunkLen)
+        pyr = self._pyramids.get(key)
+        if pyr is None or not pyr.isValid():
+            pyr = VeloPyramid(self, channel, factor, minTimes, chunkLen)
+            self._pyramids[key] = pyr
+        return pyr
+
+
+    def toSharedMemory(self):
+        """ Copy the instance into a shared memory segment
+
+        All NumPy arrays of the parameters are copied into a single segment
+        of ``multiprocessing.shared_memory`` (Python 3.8 or newer). The
+        returned `SharedDOP` handle holds the name of the segment and the
+        remaining parameters and is cheap to pickle, e.g. to send it to
+        another process. ``handle.attach()`` returns an instance whose arrays
+        are views of the segment, so no profile data are copied.
+
+        The segment exists until ``handle.unlink()`` is called, typically by
+        the consumer after it attached or by the producer at the end.
+
+        Returns:
+        ========
+        handle: SharedDOP
+            Picklable handle of the segment.
+        """
+        arrays = {}
+        values = {}
+        for k, v in self._values.items():
+            if isinstance(v, np.ndarray) and v.dtype != object:
+                arrays[k] = v
+            else:
+                values[k] = v
+
+        # arrays are aligned to 64 bytes inside the segment
+        layout = {}
+        size = 0
+        for k, v in arrays.items():
+            layout[k] = (size, v.shape, v.dtype.str)
+            size += -(-v.nbytes // 64) * 64
+
+        shm = SharedDOP._openSegment(create=True, size=max(size, 1))
+        try:
+            for k, v in arrays.items():
+                offset, shape, dtype = layout[k]
+                np.ndarray(shape, dtype, buffer=shm.buf, offset=offset)[...] = v
+        except:
+            shm.close()
+            SharedDOP._unlinkSegment(shm.name)
+            raise
+
+        # instance attributes without the caches and the file object
+        attrs = dict((k, v) for k, v in self.__dict__.items()
+                     if k not in ('_values', '_file', '_reduceCache',
+                                  '_pyramids', '_shm'))
+
+        handle = SharedDOP(shm.name, self.__class__.__name__, attrs, values,
+                           layout)
+        shm.close()
+        return handle
+
+
     def printSettings(self, channel, align='>16'):
         """ Prints out the operating parameters of a channel
 
@@ -686,15 +1510,17 @@ class DOPBase(object):
 
 
     def contour(self, profile, channel=None, timerange=slice(None),
-                depthrange=slice(None), maxtimes=1000, **kw):
+                depthrange=slice(None), maxtimes=1000, reduction='envelope',
+                xlimits=None, **kw):
         """ Show the contour plot of a profile over time and depth
 
         Attention:
             Use this method only as a quick way to visualise the UDV-data.
-            To save RAM, a maximum of only 1000 timesteps are selected by
-            default in the time range given. This possible exclusion of
-            intermediate timesteps may create errors in the visualisation.
-            See the explanation of `maxtimes` for more information.
+            To save RAM, the time range given is reduced to a maximum of only
+            1000 timesteps by default. Each plotted timestep aggregates a bin
+            of consecutive timesteps (see `reduction`), which smoothes the
+            visualisation. See the explanation of `maxtimes` for more
+            information.
 
         Arguments:
         ==========
@@ -713,10 +1539,20 @@ class DOPBase(object):
             No more than `maxtimes` timesteps are used for plotting. This can
             be used if the length of the measurement is very large, which could
             cause the RAM to be overloaded by the ``pyplot.contourf`` function.
-            Any value below 1 plots ALL timesteps (use at own risk). Be aware
-            that this option can discard intermediate timesteps from plotting
-            completely, which could cause artefacts or errors in the
-            visualisation.
+            Any value below 1 plots ALL timesteps (use at own risk). The
+            reduced data is cached, so repeated plots of the same data are
+            fast.
+        reduction: {'envelope', 'maxabs', 'mean'}
+            Aggregation of the timesteps in each time bin. ``'envelope'``
+            plots the minimum and maximum of each bin in the order they
+            occur (two timesteps per bin), ``'maxabs'`` the value with the
+            largest magnitude and ``'mean'`` the average of the bin. The
+            first two keep single spikes visible.
+        xlimits: tuple or None
+            Time window ``(t0, t1)`` in s to be plotted, replaces `timerange`.
+            For velocity profiles with the reductions ``'maxabs'`` and
+            ``'mean'`` the matching level of the cached velocity pyramid is
+            used (see `DOPBase.pyramid`), so only the window is read.
 
         Keyword-Arguments:
         ==================
@@ -742,9 +1578,7 @@ class DOPBase(object):
             chN = 1
             channel = [channel]
 
-        time = self.getTime(channel)
         depth = self.getDepth(channel)
-        data = self.getChannelParam(profile, channel)
 
         fig, ax = plt.subplots(chN, 1, squeeze=False, sharex=True)
         ax[-1,0].set_xlabel('Time [s]')
@@ -752,26 +1586,116 @@ class DOPBase(object):
         for ci, ch in enumerate(channel):
             ax[ci, 0].set_ylabel('Depth [mm]')
 
-            X, Y = np.meshgrid(time[ci][timerange], depth[ci][depthrange])
-            Z = data[ci][timerange, depthrange].T
-
-            tN = X.shape[1]
-            if 1 <= maxtimes < tN:
-                inds = np.round(np.linspace(0, tN-1, maxtimes)).astype(int)
-                X = X[:,inds]
-                Y = Y[:,inds]
-                Z = Z[:,inds]
-
+            # 1d-coordinates avoid the memory of a full meshgrid
+            if (xlimits is not None and profile == 'velo' and
+                    reduction in ('maxabs', 'mean')):
+                X, Z = self.pyramid(ch).window(xlimits[0], xlimits[1],
+                                               maxtimes, reduction)
+                Z = Z[:, depthrange]
+            else:
+                chTimerange = timerange
+                if xlimits is not None:
+                    time = self.getTime(ch)
+                    chTimerange = slice(
+                        np.searchsorted(time, xlimits[0], side='left'),
+                        np.searchsorted(time, xlimits[1], side='right'))
+                X, Z = self._reduceTime(profile, ch, chTimerange, depthrange,
+                                        maxtimes, reduction)
+            Y = depth[ci][depthrange]
 
             if levelN is None:
-                cont = ax[ci, 0].contourf(X, Y, Z, **kw)
+                cont = ax[ci, 0].contourf(X, Y, Z.T, **kw)
             else:
-                cont = ax[ci, 0].contourf(X, Y, Z, levelN, **kw)
+                cont = ax[ci, 0].contourf(X, Y, Z.T, levelN, **kw)
             plt.colorbar(cont, ax=ax[ci, 0])
 
 
+    def _reduceTime(self, profile, channel, timerange, depthrange, bins,
+                    reduction):
+        """ Reduce a profile to at most `bins` timesteps for plotting
+
+        Returns the time array and the reduced profile ``data[time, depth]``.
+        The results of the last `_reduceCacheSize` combinations of the
+        arguments are cached.
+        """
+        data = self.getChannelParam(profile, channel)
+
+        key = (profile, channel,
+               (timerange.start, timerange.stop, timerange.step),
+               (depthrange.start, depthrange.stop, depthrange.step),
+               bins, reduction)
+        cached = self._reduceCache.pop(key, None)
+        if cached is not None and cached[0] is data:
+            # same data array as when cached (see e.g. `removeAliasing`),
+            # reinserted as the most recently used entry
+            self._reduceCache[key] = cached
+            return cached[1:]
+
+        time = self.getTime(channel)[timerange]
+        data = data[timerange, depthrange]
+
+        tN = len(time)
+        if reduction == 'envelope':
+            binN = bins // 2  # two timesteps per bin
+        else:
+            binN = bins
+
+        if 1 <= bins < tN and binN >= 1:
+            # bins of equal length are reshaped without copying the data,
+            # a shorter last bin is reduced separately
+            binLen = int(np.ceil(tN / binN))
+            fullN = tN // binLen * binLen
+            parts = [self._reduceBins(
+                time[:fullN].reshape(-1, binLen),
+                data[:fullN].reshape(-1, binLen, data.shape[1]), reduction)]
+            if fullN < tN:
+                parts.append(self._reduceBins(time[fullN:][np.newaxis],
+                                              data[fullN:][np.newaxis],
+                                              reduction))
+            time = np.concatenate([p[0] for p in parts])
+            data = np.concatenate([p[1] for p in parts])
+
+        self._reduceCache[key] = (self.getChannelParam(profile, channel),
+                                  time, data)
+        while len(self._reduceCache) > self._reduceCacheSize:
+            self._reduceCache.popitem(last=False)  # least recently used
+
+        return time, data
+
+
+    def _reduceBins(self, time, data, reduction):
+        """ Aggregate the timesteps of bins
+
+        `time` has the form ``time[bin, step]`` and `data` the form
+        ``data[bin, step, depth]``.
+        """
+        if data.shape[1] == 1:
+            return time[:,0], data[:,0]
+
+        if reduction == 'mean':
+            return time.mean(axis=1), data.mean(axis=1)
+
+        elif reduction == 'maxabs':
+            return time.mean(axis=1), reduceMaxAbs(data, axis=1)
+
+        elif reduction == 'envelope':
+            # minimum and maximum in the order of their occurrence
+            dmin = data.min(axis=1)
+            dmax = data.max(axis=1)
+            minFirst = data.argmin(axis=1) <= data.argmax(axis=1)
+            first = np.where(minFirst, dmin, dmax)
+            last = np.where(minFirst, dmax, dmin)
+
+            time = np.stack([time[:,0], time[:,-1]], axis=1).ravel()
+            data = np.stack([first, last], axis=1)
+            return time, data.reshape(-1, data.shape[2])
+
+        raise Exception('Reduction {!r} is unknown.'.format(reduction))
+
+
     def replay(self, profile, channel, start=0, end=-1, fps=None,
-               showMean=False, showRunMean=False, **kw):
+               showMean=False, showRunMean=False, blit=True, skipFrames=True,
+               saveAs=None, **kw):
         """ Show an animated timeline of a profile
 
         Arguments:
@@ -796,6 +1720,18 @@ class DOPBase(object):
         showRunMean: bool
             Plot the running time-average over the timeline (from `start` to
             the current frame)
+        blit: bool
+            Redraw only the animated lines and the title on top of a cached
+            background instead of the whole figure.
+        skipFrames: bool
+            Skip profiles if drawing is slower than `fps`, so that the
+            animation keeps the requested speed. The running average still
+            includes the skipped profiles.
+        saveAs: str or None
+            File name of a video (e.g. ``'replay.mp4'`` or ``'replay.gif'``).
+            If given, all frames are rendered offscreen as fast as possible
+            and saved with `fps` frames per second instead of being shown.
+            Requires a movie writer supported by ``matplotlib.animation``.
 
         Keyword-Arguments:
         ==================
@@ -834,6 +1770,9 @@ class DOPBase(object):
             the lines. If multiple channels are given in `channel`, a tuple of
             dicts for each respective channel may be given. If a single dict is
             given, its entries are used for all channels.
+        saveKw: dict
+            Keyword dictionary passed to ``matplotlib.animation.Animation.save``
+            if `saveAs` is given (e.g. ``{'dpi': 150}``).
         """
         def getData(channel, index='all'):
             data = self.getChannelParam(profile, channel)
@@ -864,6 +1803,7 @@ class DOPBase(object):
 
         hlines = kw.pop('hlines', [])
         vlines = kw.pop('vlines', [])
+        saveKw = kw.pop('saveKw', {})
 
         fig, ax = plt.subplots(chN, 1, squeeze=False)
         ax[-1,-1].set_xlabel('Depth [mm]')
@@ -914,19 +1854,78 @@ class DOPBase(object):
 
                 a.vlines(xvals, **vlinesStyle)
 
+        # sums of the profiles for the running average
+        runSum = [np.zeros(len(self.getDepth(ch))) for ch in channel]
+        shown = [start-1]  # last shown time index
 
-        for i, ti in enumerate(range(start, end)):
-            plt.pause(1./fps)
+        def showFrame(ti):
+            # set the animated artists to time index `ti`
             for ci, ch in enumerate(channel):
-                if not plt.fignum_exists(fig.number):
-                    return
-
                 lines[ci].set_ydata(getData(ch, ti))
-                ax[0,0].set_title(titleText.format(i+1, time[ti]))
                 if showRunMean:
-                    data = np.array(runMeanLines[ci].get_ydata())
-                    data = (getData(ch, ti) + data*i) / (i+1)
-                    runMeanLines[ci].set_ydata(data)
+                    # add all profiles since the last frame (incl. skipped)
+                    runSum[ci] += np.sum(getData(ch, slice(shown[0]+1, ti+1)),
+                                         axis=0)
+                    runMeanLines[ci].set_ydata(runSum[ci] / (ti-start+1))
+            ax[0,0].set_title(titleText.format(ti-start+1, time[ti]))
+            shown[0] = ti
+
+            return animated
+
+        animated = lines + [ax[0,0].title]
+        if showRunMean:
+            animated += runMeanLines
+
+        if saveAs is not None:
+            # render offscreen as fast as possible
+            from matplotlib.animation import FuncAnimation
+
+            anim = FuncAnimation(fig, showFrame, frames=range(start, end),
+                                 init_func=lambda: animated, repeat=False)
+            anim.save(saveAs, fps=fps, **saveKw)
+            plt.close(fig)
+            return
+
+        canvas = fig.canvas
+        if blit:
+            for a in animated:
+                a.set_animated(True)
+
+            background = [None]
+            def cacheBackground(event):
+                # the background changes on every full redraw (e.g. resize)
+                background[0] = canvas.copy_from_bbox(fig.bbox)
+                for a in animated:
+                    fig.draw_artist(a)
+            canvas.mpl_connect('draw_event', cacheBackground)
+
+        plt.show(block=False)
+        canvas.draw()
+
+        tStart = default_timer()
+        ti = start
+        while ti < end:
+            if not plt.fignum_exists(fig.number):
+                return
+
+            showFrame(ti)
+            if blit:
+                canvas.restore_region(background[0])
+                for a in animated:
+                    fig.draw_artist(a)
+                canvas.blit(fig.bbox)
+            else:
+                canvas.draw_idle()
+
+            # wait for the next frame or skip frames that are already late
+            elapsed = default_timer() - tStart
+            if skipFrames:
+                # the last profile is never skipped
+                ti = min(max(ti+1, start + int(elapsed*fps) + 1),
+                         max(ti+1, end-1))
+            else:
+                ti += 1
+            canvas.start_event_loop(max((ti-start)/fps - elapsed, 1e-3))
 
 
 
@@ -1122,6 +2121,11 @@ class DOP2000(DOPBase):
         ['channel', -3, 'B'],
         ['length2', -2, 'H'],
         ]
+    # parameters at the end of the blocks used by `TailReader`
+    _measTimeStamp = _measParam[1]
+    _measChannel = _measParam[-2]
+    _measLen2 = _measParam[-1]
+    _timeStampUnit = 1e-6  # in s
     # calculate the length of the fixed part of every measurement block
     _measFixedLen = struct.calcsize(_measLen[2])
     for param, offset, fmt in _measParam:
@@ -1160,6 +2164,8 @@ class DOP2000(DOPBase):
         measN = 0  # total number of measurements
         measCh = np.zeros(10)  # measurements per channel
         dataCh = np.zeros(10)  # data length per channel
+        offsetCh = [[] for ch in range(10)]  # block offsets per channel
+        timeCh = [[] for ch in range(10)]  # timestamps per channel
 
         measStart = self._measBaseOffset  # first block offset
 
@@ -1167,6 +2173,9 @@ class DOP2000(DOPBase):
         _, offsetL, fmtL = self._measLen  # block length (at start of block)
         _, offsetL2, fmtL2 = self._measParam[-1]  # length at end of block
         _, offsetC, fmtC = self._measParam[-2]  # channel
+        _, offsetTS, fmtTS = self._measParam[1]  # timestamp
+        _, offsetTR, fmtTR = self._measParam[3]  # trigger state
+        triggerCh = [[] for ch in range(10)]  # trigger states per channel
 #        param, offsetT, fmtT = self._measProfParam[1]  # profile type
 
         # scan file
@@ -1198,6 +2207,15 @@ class DOP2000(DOPBase):
             ch = self._readParam('', measEnd+offsetC, fmtC, save=False)
             measCh[ch-1] += 1
             dataCh[ch-1] = dataLen
+            offsetCh[ch-1].append(measStart)
+
+            # timestamps and trigger states are otherwise read with the
+            # measurement blocks
+            if not self._loadMeas:
+                timeCh[ch-1].append(self._readParam('', measEnd+offsetTS,
+                                                    fmtTS, save=False))
+                triggerCh[ch-1].append(self._readParam('', measEnd+offsetTR,
+                                                       fmtTR, save=False))
 
             # next block
             measStart = measEnd
@@ -1210,6 +2228,13 @@ class DOP2000(DOPBase):
             preCh = self._prefixChannel(ch)
             self.setParam(preCh + 'measN', int(measCh[ch-1]))
             self.setParam(preCh + 'dataLen', int(dataCh[ch-1]))
+            self.setParam(preCh + 'measOffset',
+                          np.array(offsetCh[ch-1], dtype=np.int64))
+            if not self._loadMeas:
+                self.setParam(preCh + 'time',
+                              np.array(timeCh[ch-1], dtype=float))
+                self.setParam(preCh + 'triggerState',
+                              np.array(triggerCh[ch-1], dtype=float))
 
 
     def _read(self):
@@ -1222,6 +2247,10 @@ class DOP2000(DOPBase):
             self._readParam(param, offset, fmt)
 
         ### Read measurement blocks
+        if not self._loadMeas:
+            # blocks are decoded on request (see `DOPBase.read_window`)
+            return
+
         measStart = self._measBaseOffset  # first measurement start
 
         for meas in range(1, self.getParam('measN')+1):
@@ -1231,7 +2260,9 @@ class DOP2000(DOPBase):
             param, offset, fmt = self._measLen
             measStart += offset
             measLen = self._readParam(preMeas+param, measStart, fmt,
-                                      save=self._saveMeas)
+                                      save=False)
+            if self._saveMeas:
+                self._setMeasParam(meas, param, measLen)
             measEnd = measStart + measLen
 
             for param, offset, fmt in self._measParam:
@@ -1245,8 +2276,16 @@ class DOP2000(DOPBase):
                 elif offset < 0:
                     offset += measEnd
 
+                save = self._saveMeas
+                if param == 'data' and save == 'columnar':
+                    # the payload is not copied, only its offset is stored
+                    self._setMeasParam(meas, 'dataOffset', offset)
+                    save = False
+
                 value = self._readParam(preMeas+param, offset, fmt,
-                                        save=self._saveMeas)
+                                        save=False)
+                if save:
+                    self._setMeasParam(meas, param, value)
 
                 if param == 'channel':
                     channel = value
@@ -1278,6 +2317,15 @@ class DOP2000(DOPBase):
             measStart = measEnd
 
 
+    def _measDataLayout(self, meas, profile):
+        """ Returns offset, number and format of the data of a block """
+        preMeas = self._prefixMeas(meas)
+        length = self.getParam(preMeas + 'length') - self._measFixedLen
+        offset = self.getParam(preMeas + 'dataOffset') \
+            if preMeas + 'dataOffset' in self else None
+        return offset, length, 'b'
+
+
     def _refine(self):
         """ Process data read from the BDD file
         """
@@ -1317,39 +2365,71 @@ class DOP2000(DOPBase):
             self._refine_front()
 
         ### process measured profiles
-        # After 2**32-1 us the time-value (int32) overflows (returns to 0).
-        timeOverflow = 2**32-1  # in us (about 1.193 h)
+        self._mapChannels(self._refineMeas, self.getParam('channelUsed'))
 
-        for ch in self.getParam('channelUsed'):
-            preCh = self._prefixChannel(ch)
 
-            # correct time-overflow
-            timestamp = self.getParam(preCh + 'time')  # in us
-            timestamp[1:] += np.cumsum(np.ediff1d(timestamp) < 0)*timeOverflow
-            self.setParam(preCh + 'time', timestamp*1e-6)
+    def _refineMeas(self, ch):
+        """ Process the measured profiles of a channel
+        """
+        preCh = self._prefixChannel(ch)
+
+        # correct time-overflow
+        # After 2**32-1 us the time-value (int32) overflows (returns to 0).
+        timeOverflow = 2**32-1  # in us (about 1.193 h)
+        timestamp = self.getParam(preCh + 'time')  # in us
+        timestamp[1:] += np.cumsum(np.ediff1d(timestamp) < 0)*timeOverflow
+        self.setParam(preCh + 'time', timestamp*1e-6)
 
-            # caluclate depth in mm from operation parameters
-            self.setParam(preCh + 'depth', self._calcDepth(ch))
+        # caluclate depth in mm from operation parameters
+        self.setParam(preCh + 'depth', self._calcDepth(ch))
 
-            # process measured data
-            profType = self.getProfileType(ch)
-            gateN = self.getParam(preCh + 'gateN')
+        # process measured data
+        profType = self.getProfileType(ch)
+        gateN = self.getParam(preCh + 'gateN')
+        if self._loadMeas:
             data = self._popParam(preCh + 'data')
+        else:
+            # no profiles loaded, only the maximum values are calculated
+            data = np.empty((0, gateN*len(profType)))
 
-            for i, pT in enumerate(profType):
-                prof = data[:, i*gateN:(i+1)*gateN]
+        for i, pT in enumerate(profType):
+            prof = data[:, i*gateN:(i+1)*gateN]
 
-                if pT == 'velo':
-                    prof, vmax = self._calcVelo(prof, ch)
-                    self.setParam(preCh + 'veloMax', vmax)
+            if pT == 'velo':
+                prof, vmax = self._calcVelo(prof, ch)
+                self.setParam(preCh + 'veloMax', vmax)
 
-                if pT == 'echo':
-                    prof, emax = self._calcEcho(prof, ch)
-                    self.setParam(preCh + 'echoMax', emax)
+            if pT == 'echo':
+                prof, emax = self._calcEcho(prof, ch)
+                self.setParam(preCh + 'echoMax', emax)
 
+            if self._loadMeas:
                 self.setParam(preCh + pT, prof)
 
 
+    def _decodeMeas(self, buf, pos):
+        """ Decode the profiles of a measurement block from a buffer
+        """
+        _, offsetL, fmtL = self._measLen
+        measStart = pos + offsetL
+        measLen = struct.unpack_from(fmtL, buf, measStart)[0]
+        measEnd = measStart + measLen
+
+        _, offsetC, fmtC = self._measParam[-2]
+        channel = struct.unpack_from(fmtC, buf, measEnd+offsetC)[0]
+
+        _, offsetD, _ = self._measParam[0]
+        data = np.frombuffer(buf, dtype=np.int8, offset=measStart+offsetD,
+                             count=measLen-self._measFixedLen)
+
+        gateN = self.getParam(self._prefixChannel(channel) + 'gateN')
+        profiles = {}
+        for i, pT in enumerate(self.getProfileType(channel)):
+            profiles[pT] = data[i*gateN:(i+1)*gateN]
+
+        return channel, profiles
+
+
     def _refine_front(self):
         # front channel is treated as channel 1
         preCh = self._prefixChannel(1)
@@ -1526,8 +2606,7 @@ class DOP2000(DOPBase):
         angle = self.getParam(preCh + 'dopplerAngle')*np.pi/180.
 
         # correct offset
-        data[data + veloOffset > 127] -= 256
-        data[data + veloOffset < -128] += 256
+        self._correctVeloOffset(data, veloOffset)
 
         veloFactor = 1e6*soundSpeed / \
                      (2e3*np.cos(angle)*emitFreq*128*prfPeriod*veloScale)
@@ -1541,7 +2620,7 @@ class DOP2000(DOPBase):
     def _calcEcho(self, data, channel):
         """ Echo amplitude
         """
-        data += (data<0)*256
+        np.add(data, 256, out=data, where=data<0)  # unsigned values
 
         modSc = self.getChannelParam('moduleScale', channel)
         # modSc->emax: 1->2048, 2->1024, 4->512, 8->256
@@ -1749,6 +2828,11 @@ class DOP3000(DOPBase):
         ['channel', -3, 'B'],
         ['length2', -2, 'H']
         ]
+    # parameters at the end of the blocks used by `TailReader`
+    _measTimeStamp = _measInfoParam[0]
+    _measChannel = _measInfoParam[-2]
+    _measLen2 = _measInfoParam[-1]
+    _timeStampUnit = 1e-4  # in s
     # The following parameters receive the prefix 'meas<n>_prof<m>_' where <n>
     # is the measurement number starting at 1 (see also DOPBase._prefixMeas)
     # and <m> is the profile number starting at 1 (see also
@@ -1829,6 +2913,9 @@ class DOP3000(DOPBase):
         exhausted = False  # set True once file end is reached
         measN = 0  # total number of measurements
         measCh = np.zeros(10, dtype=int)  # measurements per channel
+        offsetCh = [[] for ch in range(10)]  # block offsets per channel
+        timeCh = [[] for ch in range(10)]  # timestamps per channel
+        offsetDepth = []  # offsets of blocks with depth profiles
 
         measStart = self._measBaseOffset  # first block offset
 
@@ -1836,6 +2923,9 @@ class DOP3000(DOPBase):
         _, offsetL, fmtL = self._measLen  # block length (at start of block)
         _, offsetL2, fmtL2 = self._measInfoParam[-1]  # length at end of block
         _, offsetC, fmtC = self._measInfoParam[-2]  # channel
+        _, offsetTS, fmtTS = self._measInfoParam[0]  # timestamp
+        _, offsetTR, fmtTR = self._measInfoParam[3]  # trigger state
+        triggerCh = [[] for ch in range(10)]  # trigger states per channel
         param, offsetT, fmtT = self._measProfParam[1]  # profile type
 
         # scan file
@@ -1870,6 +2960,17 @@ class DOP3000(DOPBase):
             if profTypeName != 'depth':
                 ch = self._readParam('', measEnd+offsetC, fmtC, save=False)
                 measCh[ch-1] += 1
+                offsetCh[ch-1].append(measStart)
+
+                # timestamps and trigger states are otherwise read with the
+                # measurement blocks
+                if not self._loadMeas:
+                    timeCh[ch-1].append(self._readParam('', measEnd+offsetTS,
+                                                        fmtTS, save=False))
+                    triggerCh[ch-1].append(self._readParam(
+                        '', measEnd+offsetTR, fmtTR, save=False))
+            else:
+                offsetDepth.append(measStart)
 
             # next block
             measStart = measEnd
@@ -1881,6 +2982,15 @@ class DOP3000(DOPBase):
         for ch in channelUsed:
             preCh = self._prefixChannel(ch)
             self.setParam(preCh + 'measN', int(measCh[ch-1]))
+            self.setParam(preCh + 'measOffset',
+                          np.array(offsetCh[ch-1], dtype=np.int64))
+            if not self._loadMeas:
+                self.setParam(preCh + 'time',
+                              np.array(timeCh[ch-1], dtype=float))
+                self.setParam(preCh + 'triggerState',
+                              np.array(triggerCh[ch-1], dtype=float))
+
+        return offsetDepth
 
 
     def _readMeas(self, meas, measStart):
@@ -1904,16 +3014,20 @@ class DOP3000(DOPBase):
         # read measurement length
         param, offset, fmt = self._measLen
         measStart += offset
-        measLen = self._readParam(preMeas+param, measStart, fmt,
-                                  save=self._saveMeas)
+        measLen = self._readParam(preMeas+param, measStart, fmt, save=False)
+        if self._saveMeas:
+            # the values are written to the columns of `ParamStore`, without
+            # the parameter names
+            self._setMeasParam(meas, param, measLen)
         measEnd = measStart + measLen
 
         # read measurement information
         for param, offset, fmt in self._measInfoParam:
             # set offset from end of measurement
             offset += measEnd
-            value = self._readParam(preMeas+param, offset, fmt,
-                                    save=self._saveMeas)
+            value = self._readParam(preMeas+param, offset, fmt, save=False)
+            if self._saveMeas:
+                self._setMeasParam(meas, param, value)
 
             # extract important information for next steps
             if param == 'channel':
@@ -1949,7 +3063,9 @@ class DOP3000(DOPBase):
             param, offset, fmt = self._measProfParam[0]
             profEnd += struct.calcsize(fmt)
             profLen = self._readParam(preProf+param, profStart+offset, fmt,
-                                      save=self._saveMeas)
+                                      save=False)
+            if self._saveMeas:
+                self._setMeasParam(meas, param, profLen, profile)
             if profLen == 0:
                 # no more profiles in this measurement
                 break
@@ -1958,19 +3074,30 @@ class DOP3000(DOPBase):
             param, offset, fmt = self._measProfParam[1]
             profEnd += struct.calcsize(fmt)
             profType = self._readParam(preProf+param, profStart+offset, fmt,
-                                       save=self._saveMeas)
+                                       save=False)
             profFmt = self._profileTypeFmt[profType]
             profName = self._profileTypeNames[profType]
-            if self._saveMeas:
-                self.setParam(preProf+'format', profFmt)
+            save = self._saveMeas
+            if save:
+                self._setMeasParam(meas, param, profType, profile)
+            if save and save != 'columnar':
+                # the format follows from the type (see `_measDataLayout`)
+                self._setMeasParam(meas, 'format', profFmt, profile)
 
             # read profile data
             param, offset, fmt = self._measProfParam[2]
             fmt = fmt.format(length=profLen/struct.calcsize(profFmt),
                              fmt=profFmt)
             profEnd += struct.calcsize(fmt)
+            if save == 'columnar':
+                # the payload is not copied, only its offset is stored
+                self._setMeasParam(meas, 'dataOffset', profStart+offset,
+                                   profile)
+                save = False
             data = self._readParam(preProf+param, profStart+offset, fmt,
-                                   save=self._saveMeas)
+                                   save=False)
+            if save:
+                self._setMeasParam(meas, param, data, profile)
 
             if profName == 'depth':
                 # profile depth
@@ -1991,11 +3118,57 @@ class DOP3000(DOPBase):
             profStart = profEnd
 
         if self._saveMeas:
-            self.setParam(preMeas+'profN', profile-1) # number of profiles
+            self._setMeasParam(meas, 'profN', profile-1) # number of profiles
 
         return measEnd
 
 
+    def _decodeMeas(self, buf, pos):
+        """ Decode the profiles of a measurement block from a buffer
+        """
+        _, offsetL, fmtL = self._measLen
+        measStart = pos + offsetL
+        measEnd = measStart + struct.unpack_from(fmtL, buf, measStart)[0]
+
+        _, offsetC, fmtC = self._measInfoParam[-2]
+        channel = struct.unpack_from(fmtC, buf, measEnd+offsetC)[0]
+
+        _, offsetPL, fmtPL = self._measProfParam[0]  # profile length
+        _, offsetPT, fmtPT = self._measProfParam[1]  # profile type
+        _, offsetPD, _ = self._measProfParam[2]  # profile data
+
+        profiles = {}
+        profStart = measStart + struct.calcsize(fmtL)
+        while True:
+            profLen = struct.unpack_from(fmtPL, buf, profStart+offsetPL)[0]
+            if profLen == 0:
+                # no more profiles in this measurement
+                break
+
+            profType = struct.unpack_from(fmtPT, buf, profStart+offsetPT)[0]
+            dtype = np.dtype(self._profileTypeFmt[profType])
+            profiles[self._profileTypeNames[profType]] = np.frombuffer(
+                buf, dtype=dtype, offset=profStart+offsetPD,
+                count=profLen//dtype.itemsize)
+
+            # next profile
+            profStart += offsetPD + profLen
+
+        return channel, profiles
+
+
+    def _measDataLayout(self, meas, profile):
+        """ Returns offset, number and format of the data of a profile """
+        if profile is None:
+            raise Exception('The profile number is required for DOP3000.')
+        preProf = self._prefixMeas(meas) + self._prefixProfile(profile)
+        fmt = self._profileTypeFmt[self.getParam(preProf + 'type')]
+        length = self.getParam(preProf + 'length') // struct.calcsize(fmt)
+        offset = self.getParam(preProf + 'dataOffset') \
+            if preProf + 'dataOffset' in self else None
+        return offset, length, fmt
+
+
     def _read(self):
         """ Read the data in the given BDD file
         """
@@ -2013,7 +3186,28 @@ class DOP3000(DOPBase):
                 self._readParam(preCh+param, baseOffset+offset, fmt)
 
         ### read measured profiles
-        self._scanFile()  # find number of measurements
+        offsetDepth = self._scanFile()  # find number of measurements
+
+        if not self._loadMeas:
+            # blocks are decoded on request (see `DOPBase.read_window`), only
+            # the depth profiles and the profile types are read here
+            firstMeas = [self.getParam(self._prefixChannel(ch)+'measOffset')[0]
+                         for ch in self.getChannels()]
+            _, offsetL, fmtL = self._measLen
+            for measStart in offsetDepth + firstMeas:
+                measLen = self._readParam('', measStart+offsetL, fmtL,
+                                          save=False)
+                self._file.seek(measStart)
+                buf = self._file.read(offsetL + measLen)
+
+                channel, profiles = self._decodeMeas(buf, 0)
+                preCh = self._prefixChannel(channel)
+                if 'depth' in profiles:
+                    self.setParam(preCh + 'depthFile',
+                                  np.array(profiles['depth']))
+                else:
+                    self.setParam(preCh + 'profTypeName', list(profiles))
+            return
 
         measStart = self._measBaseOffset  # first block start
         for meas in range(1, self.getParam('measN')+1):
@@ -2092,36 +3286,45 @@ class DOP3000(DOPBase):
 
 
         ### process measurement data
+        self._mapChannels(self._refineMeas, self.getChannels())
+
+
+    def _refineMeas(self, ch):
+        """ Process the measured profiles of a channel
+        """
+        preCh = self._prefixChannel(ch)
+
+        # correct time-overflow & convert to seconds
         # After 2**32-1 ms/10 the time-value (int32) overflows (returns to 0).
         timeOverflow = 2**32-1  # in ms/10 (about 4.97 days)
+        timestamp = self.getParam(preCh + 'time')  # in ms/10
+        timestamp[1:] += np.cumsum(np.ediff1d(timestamp) < 0)*timeOverflow
+        self.setParam(preCh + 'time', timestamp*1e-4)
 
-        for ch in self.getChannels():
-            preCh = self._prefixChannel(ch)
-
-            # correct time-overflow & convert to seconds
-            timestamp = self.getParam(preCh + 'time')  # in ms/10
-            timestamp[1:] += np.cumsum(np.ediff1d(timestamp) < 0)*timeOverflow
-            self.setParam(preCh + 'time', timestamp*1e-4)
+        # correct depth from file
+        self._modParam(preCh + 'depthFile', lambda d: d/10.)
 
-            # correct depth from file
-            self._modParam(preCh + 'depthFile', lambda d: d/10.)
+        # caluclate depth in mm from operation parameters
+        self.setParam(preCh + 'depthCalc', self._calcDepth(ch))
 
-            # caluclate depth in mm from operation parameters
-            self.setParam(preCh + 'depthCalc', self._calcDepth(ch))
+        # without loaded profiles only the maximum values are calculated
+        empty = np.empty((0, self.getParam(preCh + 'gateN')))
 
-            # caluclate velocity in m/s
-            if 'velo' in self.getProfileType(ch):
-                velo = self.getParam(preCh + 'velo')
-                velo, vmax = self._calcVelo(velo, ch)
+        # caluclate velocity in m/s
+        if 'velo' in self.getProfileType(ch):
+            velo = self._popParam(preCh + 'velo', empty)
+            velo, vmax = self._calcVelo(velo, ch)
+            if self._loadMeas:
                 self.setParam(preCh + 'velo', velo)
-                self.setParam(preCh + 'veloMax', vmax)
+            self.setParam(preCh + 'veloMax', vmax)
 
-            # caluclate echo
-            if 'echo' in self.getProfileType(ch):
-                echo = self.getParam(preCh + 'echo')
-                echo, emax = self._calcEcho(echo, ch)
+        # caluclate echo
+        if 'echo' in self.getProfileType(ch):
+            echo = self._popParam(preCh + 'echo', empty)
+            echo, emax = self._calcEcho(echo, ch)
+            if self._loadMeas:
                 self.setParam(preCh + 'echo', echo)
-                self.setParam(preCh + 'echoMax', emax)
+            self.setParam(preCh + 'echoMax', emax)
 
 
     def _calcDepth(self, channel):
@@ -2148,12 +3351,11 @@ class DOP3000(DOPBase):
         """ Velocity and maximum velocity in m/s
         """
         preCh = self._prefixChannel(channel)
-        data = np.array(data)
+        data = np.asarray(data, dtype=float)
 
         # correct offset
         veloOffset = self.getParam(preCh+'veloOffset')
-        data[data + veloOffset > 127] -= 256
-        data[data + veloOffset < -128] += 256
+        self._correctVeloOffset(data, veloOffset)
 
         def velocity(data):
             # calculate doppler frequency [Hz]
@@ -2169,14 +3371,17 @@ class DOP3000(DOPBase):
 
             return velo
 
-        return velocity(data), velocity(128)
+        data *= velocity(1.)  # use inplace operation to save memory
+
+        return data, velocity(128)
 
 
     def _calcEcho(self, data, channel):
         """ Echo signal
         """
         emax = self.getChannelParam('moduleScale', channel)
-        data = np.array(data) * emax/255.
+        data = np.asarray(data, dtype=float)
+        data *= emax/255.  # use inplace operation to save memory
 
         return data, emax
 
@@ -2226,6 +3431,514 @@ class DOP3000(DOPBase):
 
 
 
+def reduceMaxAbs(data, idx=None, axis=0):
+    """ Returns the value of largest magnitude (max-abs) of bins of `data`
+
+    NaN are ignored, bins with only NaN are NaN. Used by the contour plots
+    (`DOPBase.contour`), `VeloPyramid` and the drawing of the GUI.
+
+    Arguments:
+    ==========
+    data: array
+        Data that is reduced along `axis`.
+    idx: array or None
+        Start indices of the bins along `axis` (see ``numpy.ufunc.reduceat``),
+        None reduces the whole axis to one value.
+    axis: int
+        Axis of the bins.
+    """
+    if idx is None:
+        high = np.fmax.reduce(data, axis=axis)
+        low = np.fmin.reduce(data, axis=axis)
+    else:
+        high = np.fmax.reduceat(data, idx, axis=axis)
+        low = np.fmin.reduceat(data, idx, axis=axis)
+    return np.where(-low > high, low, high)
+
+
+
+class VeloPyramid(object):
+    """ Multi-resolution cache of the velocity profiles of a channel
+
+    Level `k` (1, 2, ...) aggregates bins of ``factor**k`` consecutive
+    profiles to one timestep with the mean and the value of largest
+    magnitude (max-abs) of each gate. The levels are stored in a NumPy file
+    ``'<fname>.ch<n>.pyr.npy'`` next to the BDD-file, which is memory-mapped
+    for reading. Each row holds the mean time of the bin, the mean profile
+    and the max-abs profile. A stamp of the BDD-file (size, modification
+    time, `replaceParam`) and the pyramid layout is stored in
+    ``'<fname>.ch<n>.pyr.json'``. The cache is rebuilt if the stamp does not
+    match. If the directory of the BDD-file is not writable, the levels are
+    kept in memory (`inMemory`) instead.
+
+    Use `DOPBase.pyramid` to get an instance.
+    """
+    _version = 1  # layout version of the cache file
+
+    def __init__(self, dop, channel, factor=4, minTimes=1000, chunkLen=None):
+        self._dop = dop
+        self.channel = channel
+        self.factor = factor
+
+        preCh = dop._prefixChannel(channel)
+        self.time = dop.getParam(preCh + 'time')
+        self.gateN = int(dop.getParam(preCh + 'gateN'))
+
+        # number of levels until no more than `minTimes` timesteps are left
+        levelN = 1
+        while -(-len(self.time) // factor**levelN) > max(minTimes, 1):
+            levelN += 1
+        self.levelN = levelN
+
+        # row offset of every level in the cache
+        lens = [-(-len(self.time) // factor**k) for k in range(1, levelN+1)]
+        self._offsets = np.concatenate([[0], np.cumsum(lens)])
+
+        base = '{}.ch{:d}.pyr'.format(dop._fname, channel)
+        self.cacheFile = base + '.npy'
+        self.stampFile = base + '.json'
+        self.inMemory = False
+        self._memStamp = None  # stamp of the levels kept in memory
+
+        if not self.isValid():
+            try:
+                self._build(chunkLen)
+            except (IOError, OSError) as e:
+                if e.errno not in (errno.EACCES, errno.EPERM, errno.EROFS):
+                    raise
+                # read-only directory, the levels are kept in memory
+                self._data = np.empty(self._shape())
+                self._fill(self._data, chunkLen)
+                self._memStamp = self._stamp()
+                self.inMemory = True
+                return
+        self._data = np.load(self.cacheFile, mmap_mode='r')
+
+
+    def _stamp(self):
+        """ Returns the stamp of the BDD-file and the pyramid layout """
+        st = os.stat(self._dop._fname)
+        return {'version': self._version,
+                'size': st.st_size,
+                'mtime': st.st_mtime,
+                'replaceParam': repr(sorted(self._dop._replaceParam.items())),
+                'factor': self.factor,
+                'levelN': self.levelN,
+                'timeN': len(self.time),
+                'gateN': self.gateN}
+
+
+    def isValid(self):
+        """ Returns whether the cache file matches the BDD-file """
+        if self.inMemory:
+            return self._memStamp == self._stamp()
+        try:
+            with open(self.stampFile, 'r') as f:
+                stamp = json.load(f)
+        except (IOError, OSError, ValueError):
+            return False
+        return stamp == self._stamp() and os.path.exists(self.cacheFile)
+
+
+    def _shape(self):
+        """ Returns the shape of the rows of all levels """
+        return (int(self._offsets[-1]), 1 + 2*self.gateN)
+
+
+    def _build(self, chunkLen=None):
+        """ Build the cache file in one pass over chunks of profiles """
+        tmpFile = self.cacheFile + '.tmp.npy'
+        out = np.lib.format.open_memmap(tmpFile, mode='w+', dtype=float,
+                                        shape=self._shape())
+        self._fill(out, chunkLen)
+
+        out.flush()
+        del out
+        if os.path.exists(self.cacheFile):
+            os.remove(self.cacheFile)
+        os.rename(tmpFile, self.cacheFile)
+
+        # the stamp is written last, an interrupted build is never valid
+        with open(self.stampFile, 'w') as f:
+            json.dump(self._stamp(), f)
+
+
+    def _fill(self, out, chunkLen=None):
+        """ Compute the rows of all levels into `out` chunk by chunk """
+        # chunks are multiples of the largest bin, so the bins of all levels
+        # are aligned with the chunks
+        binMax = self.factor**self.levelN
+        if chunkLen is None:
+            chunkLen = binMax
+        chunkLen = -(-chunkLen // binMax) * binMax
+
+        gateN = self.gateN
+        chunks = self._dop.iterProfiles(self.channel, 'velo', chunkLen)
+        for i0, data in zip(range(0, len(self.time), chunkLen), chunks):
+            i1 = i0 + len(data)
+            time = self.time[i0:i1]
+
+            for k in range(1, self.levelN+1):
+                binLen = self.factor**k
+                idx = np.arange(0, i1-i0, binLen)
+                counts = np.diff(np.append(idx, i1-i0))[:, np.newaxis]
+
+                rows = slice(self._offsets[k-1] + i0//binLen,
+                             self._offsets[k-1] + i0//binLen + len(idx))
+                block = out[rows]
+                block[:, 0] = np.add.reduceat(time, idx) / counts[:, 0]
+                block[:, 1:1+gateN] = np.add.reduceat(data, idx, axis=0) / counts
+                block[:, 1+gateN:] = reduceMaxAbs(data, idx)
+
+
+    def level(self, k):
+        """ Returns time, mean and max-abs profiles of level `k`
+
+        The arrays are views of the memory-mapped cache. The profiles have
+        the form ``data[time, depth]``.
+        """
+        if not 1 <= k <= self.levelN:
+            raise Exception('Level {:d} is not in the '.format(k) +
+                            'range 1 to {:d}.'.format(self.levelN))
+        rows = self._data[self._offsets[k-1]:self._offsets[k]]
+        return rows[:, 0], rows[:, 1:1+self.gateN], rows[:, 1+self.gateN:]
+
+
+    def window(self, t0, t1, maxTimes=1000, reduction='maxabs'):
+        """ Returns the velocity of a time window at a matching level
+
+        The finest level with no more than `maxTimes` timesteps inside the
+        window is used. If the window holds no more than `maxTimes` profiles,
+        the profiles themselves are returned (see `DOPBase.read_window`).
+
+        Arguments:
+        ==========
+        t0, t1: float
+            Time window in s.
+        maxTimes: int
+            Maximum number of returned timesteps.
+        reduction: {'maxabs', 'mean'}
+            Aggregation of the profiles in each time bin.
+
+        Returns:
+        ========
+        time: array
+            Timestamps in s.
+        data: array
+            Velocity in m/s of the form ``data[time, depth]``.
+        """
+        if reduction not in ('maxabs', 'mean'):
+            raise Exception('Reduction {!r} is unknown.'.format(reduction))
+
+        i0 = np.searchsorted(self.time, t0, side='left')
+        i1 = np.searchsorted(self.time, t1, side='right')
+        if i1 - i0 <= maxTimes:
+            return self.time[i0:i1], self._dop._readProfiles(
+                self.channel, 'velo', i0, i1)
+
+        for k in range(1, self.levelN+1):
+            time, mean, maxabs = self.level(k)
+            # bins that overlap the window
+            j0 = i0 // self.factor**k
+            j1 = -(-i1 // self.factor**k)
+            if j1 - j0 <= maxTimes or k == self.levelN:
+                break
+
+        data = mean if reduction == 'mean' else maxabs
+        return np.array(time[j0:j1]), np.array(data[j0:j1])
+
+
+
+class SharedDOP(object):
+    """ Handle of a `DOPBase` instance in a shared memory segment
+
+    Returned by `DOPBase.toSharedMemory`. The handle only holds the name and
+    layout of the segment and the parameters that are not arrays, so it can
+    be pickled and sent to other processes cheaply (e.g. through a
+    ``multiprocessing.Queue``), where `SharedDOP.attach` creates the
+    instance without copying the arrays.
+    """
+
+    def __init__(self, name, className, attrs, values, layout):
+        self.name = name
+        self.className = className
+        self.attrs = attrs
+        self.values = values
+        self.layout = layout
+
+
+    @staticmethod
+    def _openSegment(**kw):
+        """ Create or attach to a segment that is not tracked for cleanup
+
+        The resource tracker of ``multiprocessing`` removes the segments
+        tracked by a process when it exits, but these segments outlive the
+        process that created them and are removed by `SharedDOP.unlink`.
+        """
+        from multiprocessing import shared_memory, resource_tracker
+
+        try:
+            return shared_memory.SharedMemory(track=False, **kw)
+        except TypeError:  # Python < 3.13
+            shm = shared_memory.SharedMemory(**kw)
+            resource_tracker.unregister(shm._name, 'shared_memory')
+            return shm
+
+
+    @staticmethod
+    def _unlinkSegment(name):
+        """ Remove a segment """
+        from multiprocessing import shared_memory
+
+        # the segment is tracked when opened and untracked by `unlink`
+        shm = shared_memory.SharedMemory(name=name)
+        shm.close()
+        shm.unlink()
+
+
+    def attach(self):
+        """ Returns the instance with arrays that are views of the segment
+
+        Changes of the arrays are visible to all processes attached to the
+        segment. The segment stays mapped as long as the instance or any of
+        its arrays exist.
+        """
+        cls = globals()[self.className]
+        dop = cls.__new__(cls)
+        dop.__dict__.update(self.attrs)
+        dop._file = None
+        dop._reduceCache = OrderedDict()
+        dop._pyramids = {}
+
+        dop._shm = self._openSegment(name=self.name)
+        dop._values = ParamStore(self.values)
+        for k, (offset, shape, dtype) in self.layout.items():
+            dop._values[k] = np.ndarray(shape, dtype, buffer=dop._shm.buf,
+                                        offset=offset)
+        return dop
+
+
+    def unlink(self):
+        """ Remove the segment
+
+        Attached instances stay valid, the memory is freed when the last
+        process closed the segment.
+        """
+        self._unlinkSegment(self.name)
+
+
+
+class TailReader(object):
+    """ Reads the measurement blocks of a BDD-file while it is being recorded
+
+    The parameters of the file are read once with ``DOP(fname,
+    loadMeas=False)``. Then the reader keeps the position after the last
+    complete measurement block and `TailReader.poll` decodes the blocks that
+    were appended since. A block is complete when the file holds as many
+    bytes as its length field (`_measLen`) gives; blocks that are still
+    being written are read by the next call. Only uncompressed files can be
+    followed.
+
+    The measurements are returned as tuples ``(channel, time, profiles)``
+    with the time in s (overflows of the timestamps are corrected) and a
+    dictionary of the profiles of the block by profile type. Velocities
+    are given in m/s and echo amplitudes as by `DOPBase.getEcho`.
+    """
+
+    def __init__(self, fname, start='end', **kw):
+        """ Open a BDD-file for following
+
+        Arguments:
+        ==========
+        fname: str
+            Path to the BDD-file. At least one measurement block of every
+            channel must already be written.
+        start: str
+            ``'end'`` returns only the blocks written after the file was
+            opened, ``'begin'`` returns all blocks of the file.
+
+        All other keyword arguments are passed to the `DOP` function.
+        """
+        if start not in ('begin', 'end'):
+            raise ValueError('Unknown start {!r}.'.format(start))
+        kw['loadMeas'] = False
+        self.dop = DOP(fname, **kw)
+        self.channels = list(self.dop.getChannels())
+        self._file = open(fname, 'rb')
+
+        # the timestamps (int32) overflow after 2**32-1 units
+        self._timeOverflow = 2**32-1
+        self._lastStamp = {}  # last timestamp (with overflows) per channel
+        if start == 'begin':
+            self.pos = self.dop._measBaseOffset
+            for ch in self.channels:
+                self._lastStamp[ch] = 0
+        else:
+            _, offsetL, fmtL = self.dop._measLen
+            self.pos = 0
+            for ch in self.channels:
+                # the next block starts at the end of the last block
+                last = self.dop.getParam(self.dop._prefixChannel(ch) +
+                                         'measOffset')[-1]
+                self._file.seek(last + offsetL)
+                measLen = struct.unpack(fmtL,
+                                        self._file.read(struct.calcsize(fmtL)))[0]
+                self.pos = max(self.pos, int(last) + offsetL + measLen)
+                self._lastStamp[ch] = int(round(
+                    self.dop.getTime(ch)[-1] / self.dop._timeStampUnit))
+
+
+    def poll(self):
+        """ Returns the list of measurements of the new complete blocks
+        """
+        dop = self.dop
+        self._file.seek(0, 2)
+        eof = self._file.tell()
+        if eof <= self.pos:
+            return []
+        self._file.seek(self.pos)
+        buf = self._file.read(eof - self.pos)
+
+        _, offsetL, fmtL = dop._measLen
+        _, offsetL2, fmtL2 = dop._measLen2
+        _, offsetC, fmtC = dop._measChannel
+        _, offsetTS, fmtTS = dop._measTimeStamp
+        sizeL = struct.calcsize(fmtL)
+
+        meas = []
+        pos = 0
+        while pos + offsetL + sizeL <= len(buf):
+            measStart = pos + offsetL
+            measLen = struct.unpack_from(fmtL, buf, measStart)[0]
+            measEnd = measStart + measLen
+            if measLen == 0 or measEnd > len(buf):
+                # block is not written completely
+                break
+
+            if struct.unpack_from(fmtL2, buf, measEnd+offsetL2)[0] != measLen:
+                warn('Lengths in measurement at offset ' +
+                     '{:d} do not match!'.format(self.pos + pos))
+
+            channel = struct.unpack_from(fmtC, buf, measEnd+offsetC)[0]
+            if channel in self.channels:
+                ch, profiles = dop._decodeMeas(buf, pos)
+            else:
+                profiles = {}
+
+            # blocks of unknown channels and depth blocks have no timestamps
+            if profiles and 'depth' not in profiles:
+                stamp = struct.unpack_from(fmtTS, buf, measEnd+offsetTS)[0]
+                stamp += self._lastStamp[ch] - \
+                    self._lastStamp[ch] % self._timeOverflow
+                if stamp < self._lastStamp[ch]:
+                    stamp += self._timeOverflow
+                self._lastStamp[ch] = stamp
+
+                for pT in profiles:
+                    data = np.array(profiles[pT], dtype=float)[np.newaxis]
+                    if pT == 'velo':
+                        data, _ = dop._calcVelo(data, ch)
+                    elif pT == 'echo':
+                        data, _ = dop._calcEcho(data, ch)
+                    profiles[pT] = data[0]
+                meas.append((ch, stamp*dop._timeStampUnit, profiles))
+
+            pos = measEnd
+
+        self.pos += pos
+        return meas
+
+
+    def follow(self, interval=0.005, stop=None):
+        """ Yields the measurements of new blocks as they are written
+
+        Arguments:
+        ==========
+        interval: float
+            Time in s to wait before the file is checked again if there was
+            no new block.
+        stop: threading.Event or None
+            The generator ends when the event is set. If None, the generator
+            runs until it is closed.
+        """
+        while stop is None or not stop.is_set():
+            meas = self.poll()
+            if not meas:
+                sleep(interval)
+            for m in meas:
+                yield m
+
+
+    def close(self):
+        """ Close the file """
+        self._file.close()
+
+
+
+def replayBDD(src, dst, speed=1.0, stop=None, ready=None):
+    """ Writes a BDD-file block by block at the pace of its timestamps
+
+    Simulates a recording of the file `src` in the file `dst` for testing
+    `TailReader`. The header and the blocks up to the first block of every
+    channel are written at once, so `dst` can be opened with `DOP`. Every
+    further block is written when its time since the first written block
+    has passed (divided by `speed`). Run it in a thread to follow `dst` at
+    the same time. Returns the number of blocks written one by one.
+
+    Arguments:
+    ==========
+    src: str
+        Path to the uncompressed BDD-file that is replayed.
+    dst: str
+        Path of the file that is written. An existing file is replaced.
+    speed: float
+        Factor of the replay speed, ``np.inf`` writes the blocks without
+        waiting.
+    stop: threading.Event or None
+        The replay ends when the event is set.
+    ready: threading.Event or None
+        Set when the blocks written at once are in `dst`, which can then be
+        opened with `DOP` or `TailReader`.
+    """
+    dop = DOP(src, loadMeas=False)
+    offsets = []
+    times = []
+    firstBlocks = []
+    for ch in dop.getChannels():
+        offsets.append(dop.getParam(dop._prefixChannel(ch) + 'measOffset'))
+        times.append(dop.getTime(ch))
+        firstBlocks.append(offsets[-1][0])
+    offsets = np.concatenate(offsets)
+    times = np.concatenate(times)
+    order = np.argsort(offsets)
+    offsets = offsets[order]
+    times = times[order]
+
+    # every block is written with the bytes up to the next block
+    size = os.path.getsize(src)
+    ends = np.append(offsets[1:], size)
+    i0 = np.searchsorted(offsets, max(firstBlocks))
+
+    n = 0
+    with open(src, 'rb') as fin, open(dst, 'wb') as fout:
+        fout.write(fin.read(ends[i0]))
+        fout.flush()
+        if ready is not None:
+            ready.set()
+        tStart = default_timer()
+        for i in range(i0+1, len(offsets)):
+            if stop is not None and stop.is_set():
+                break
+            wait = (times[i] - times[i0]) / speed - (default_timer() - tStart)
+            if wait > 0:
+                sleep(wait)
+            fout.write(fin.read(ends[i] - ends[i-1]))
+            fout.flush()
+            n += 1
+    return n
+
+
+
 def DOP(fname, **kw):
     """ Reads a binary DOP-file (*.BDD)
 
@@ -2253,9 +3966,17 @@ def DOP(fname, **kw):
         These are NOT affected by changes of any parameters (e.g.
         ``'soundSpeed'``). Use the optional argument ``version='Calc'`` to get
         newly calculated depth values in this case.
-    saveMeas: bool
+    saveMeas: bool or 'columnar'
         Save the raw data of the measurement blocks into the returned class
-        instance. Default: False
+        instance. ``'columnar'`` stores typed arrays of the block parameters
+        and only the file offsets of the profile data. Default: False
+    loadMeas: bool
+        Decode the profiles of all measurement blocks while reading the file.
+        If False, profiles can only be retrieved with `DOPBase.read_window`.
+        Default: True
+    workers: int
+        Number of threads used to process the channels of a multiplexed
+        measurement concurrently after reading. Default: 1
     decode_errors: str
         Error handling of ``UnicodeDecodeError`` during decoding of
         strings. See documentation of the `errors` argument in
@@ -2281,3 +4002,10 @@ def DOP(fname, **kw):
     else:
         raise Exception('BDD version {!r} '.format(version) +
                         'of file {!r} is unknown.'.format(fname))
+
+
+if sys.version_info >= (3, 7):
+    # the asyncio API uses syntax that is not available in Python 2.7
+    from DOPasync import aload_iter, aload_many
+    DOP.aload_iter = aload_iter
+    DOP.aload_many = aload_many
@@ -2,6 +2,8 @@ import tkinter as tk
 from tkinter import filedialog, messagebox
 import numpy as np
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
 
 from DOPpy import *
 from udv_analysis_lib import *
@@ -28,7 +30,7 @@ class UDV_GUI:
         self.interpolation_label.grid(row=3, column=0, sticky='w', pady=5)
         self.interpolation_var = tk.StringVar(master)
         self.interpolation_var.set("linear") # default value
-        self.interpolation_dropdown = tk.OptionMenu(master, self.interpolation_var, "none", "velo_max", "linear", "quadratic", "cubic")
+        self.interpolation_dropdown = tk.OptionMenu(master, self.interpolation_var, "none", "velo_max", "linear", "quadratic", "cubic", "time", "bilinear", "median", "time_mean", "ffill")
         self.interpolation_dropdown.grid(row=3, column=1, pady=5)
 
         self.time_limits_label = tk.Label(master, text="Time Limits (tuple):")
@@ -41,6 +43,14 @@ class UDV_GUI:
         self.start_depth_entry = tk.Entry(master)
         self.start_depth_entry.grid(row=5, column=1, pady=5)
 
+        self.detector_label = tk.Label(master, text="Outlier Detector:")
+        self.detector_label.grid(row=6, column=0, sticky='w', pady=5)
+        self.detector_var = tk.StringVar(master)
+        self.detector_var.set("jump") # default value
+        # the thresholds of the detectors are not comparable, a new detector gets its default threshold
+        self.detector_dropdown = tk.OptionMenu(master, self.detector_var, *DETECTORS, command=self.set_default_threshold)
+        self.detector_dropdown.grid(row=6, column=1, pady=5)
+
         # set up save widgets
         self.save_plot_button = tk.Button(master, text="Save Plot", state=tk.DISABLED, command=self.save_plot)
         self.save_plot_button.grid(row=7, column=0, pady=5)
@@ -49,7 +59,7 @@ class UDV_GUI:
         self.save_data_button.grid(row=7, column=1, pady=5)
 
         # set default input values
-        self.threshold_entry.insert(tk.END, "70.0")
+        self.set_default_threshold(self.detector_var.get())
         self.start_depth_entry.insert(tk.END, "50.0")
         self.time_limits_entry.insert(tk.END, "0, 20")
 
@@ -60,11 +70,30 @@ class UDV_GUI:
         self.refresh_button = tk.Button(master, text="Refresh", state=tk.NORMAL, command=self.refresh_gui)
         self.refresh_button.grid(row=10, column=1, pady=10)
 
+        # set up the embedded plots of the raw and filtered data
+        self.plot_frame = tk.Frame(master)
+        self.plot_frame.grid(row=0, column=2, rowspan=11, padx=5, pady=5)
+        self.plot_fig = Figure(figsize=(10, 6))
+        self.ax_raw, self.ax_filtered = self.plot_fig.subplots(2, 1, sharex=True, sharey=True)
+        self.canvas = FigureCanvasTkAgg(self.plot_fig, master=self.plot_frame)
+        self.canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=True)
+        self.toolbar = NavigationToolbar2Tk(self.canvas, self.plot_frame)
+        self.toolbar.update()
+        self.image_raw = None
+        self.image_filtered = None
+        self.colorbars = []
+
         # initialize figure variables
         self.fig_raw = None
         self.fig_filtered = None
         self.fig_line = None
         self.fig_average = None
+
+        # initialize data read from file
+        self.loaded_key = None
+        self.loaded = None
+        self.incremental_filter = None
+        self.shown_key = None
         
         # center the window on screen
         master.update_idletasks()
@@ -93,7 +122,9 @@ class UDV_GUI:
 
         # get processing parameters from input widgets
         try:
-            thr = float(self.threshold_entry.get())
+            thr = self.threshold_entry.get().strip()
+            # "auto" estimates one threshold per gate
+            thr = thr if thr == "auto" else float(thr)
             ignore_depth = float(self.start_depth_entry.get())
             time_limit = self.time_limits_entry.get().split(",")
             time_limit = (int(time_limit[0]), int(time_limit[1]))
@@ -102,19 +133,26 @@ class UDV_GUI:
             messagebox.showerror("Error", "Invalid input value.")
             return
 
-        # read data from file
-        try:
-            bdd = DOP(self.filepath)
-            depth = np.array(bdd.getDepth())[0]
-            time = np.array(bdd.getTime())[0]
-            data = np.array(bdd.getChannelParam('velo'))[0]
-            data = data*1e3
-            data = data.T
-            raw_data = data.copy()
-            print(data.shape)
-        except:
-            messagebox.showerror("Error", "Unable to read file.")
-            return
+        # read data from file (kept while the file and time limits do not change)
+        if self.loaded_key != (self.filepath, time_limit):
+            try:
+                # only the blocks inside the time limits are decoded
+                bdd = DOP(self.filepath, loadMeas=False)
+                channel = bdd.getChannels()[0]
+                depth = np.array(bdd.getDepth(channel))
+                time, data = bdd.read_window(time_limit[0], time_limit[1], channel, 'velo')
+                data = data*1e3
+                data = data.T
+                raw_data = data.copy()
+                print(data.shape)
+            except:
+                messagebox.showerror("Error", "Unable to read file.")
+                return
+            self.loaded_key = (self.filepath, time_limit)
+            self.loaded = (time, depth, raw_data)
+            # first differences for fast re-filtering with new parameters
+            self.incremental_filter = IncrementalFilter(raw_data, time=time)
+        time, depth, raw_data = self.loaded
 
         # ignore data up to specified depth
         s = np.searchsorted(depth, ignore_depth)
@@ -122,29 +160,86 @@ class UDV_GUI:
         try:
             print("Processing data...")
             obj = UDV()
-            fig_raw = obj.plot_data("Raw", 1, time, depth, raw_data, xlimits=(time_limit[0], time_limit[1]), levels=300)
-            corrected_data = obj.remove_outliers(time, depth, raw_data, start_id_depth=s, threshold=thr, interpolation_method=self.interpolation_var.get())
-            fig_filtered = obj.plot_data("Filtered", 2, time, depth, corrected_data, xlimits=(time_limit[0], time_limit[1]), levels=300)
+            corrected_data = self.incremental_filter.remove_outliers(start_id_depth=s, threshold=thr, interpolation_method=self.interpolation_var.get(),
+                                                                     detector=self.detector_var.get())
         except:
             messagebox.showerror("Error", "Unable to process data.")
             return
 
-        # update plot figures in GUI
-        self.fig_raw = fig_raw
-        self.fig_filtered = fig_filtered
-        self.fig_raw.show()
-        self.fig_filtered.show()
-
         self.time = time
         self.depth = depth
         self.corrected_data = corrected_data
+        self.obj = obj
+
+        # update the embedded plots, the raw image is only redrawn for new data
+        self.show_data(new_images=self.image_raw is None or self.loaded_key != self.shown_key)
+        self.shown_key = self.loaded_key
+
+        # the full resolution figures are only created when saving
+        self.fig_raw = None
+        self.fig_filtered = None
 
         # enable save buttons
         self.save_plot_button.config(state=tk.NORMAL)
         self.save_data_button.config(state=tk.NORMAL)
-        self.obj = obj
+
+    def set_default_threshold(self, detector):
+        self.threshold_entry.delete(0, tk.END)
+        self.threshold_entry.insert(tk.END, str(THRESHOLDS[detector]))
+
+    def show_data(self, new_images):
+        time, depth, raw_data = self.loaded
+        if new_images:
+            # new images covering the whole time limits
+            for cb in self.colorbars:
+                cb.remove()
+            self.ax_raw.clear()
+            self.ax_filtered.clear()
+            self.image_raw = self.ax_raw.imshow(raw_data[:, :1], aspect='auto', origin='lower', cmap='viridis', interpolation='nearest')
+            self.image_filtered = self.ax_filtered.imshow(raw_data[:, :1], aspect='auto', origin='lower', cmap='viridis', interpolation='nearest')
+            self.ax_raw.set_title("Raw")
+            self.ax_filtered.set_title("Filtered")
+            for ax in (self.ax_raw, self.ax_filtered):
+                ax.set_ylabel('Depth (mm)')
+                ax.set_autoscale_on(False)
+            self.ax_filtered.set_xlabel("Time (s)")
+            self.ax_raw.set_xlim(time[0], time[-1])
+            self.ax_raw.set_ylim(depth[0], depth[-1])
+            self.colorbars = [self.plot_fig.colorbar(self.image_raw, ax=self.ax_raw),
+                              self.plot_fig.colorbar(self.image_filtered, ax=self.ax_filtered)]
+            self.draw_tile(self.image_raw, raw_data, self.ax_raw.get_xlim())
+            self.image_raw.set_clim(np.nanmin(raw_data), np.nanmax(raw_data))
+            # clearing the axes drops the callbacks, pan and zoom re-render the visible tiles
+            self.ax_raw.callbacks.connect('xlim_changed', self.update_tiles)
+
+        # only the filtered image is updated after re-filtering
+        self.draw_tile(self.image_filtered, self.corrected_data, self.ax_raw.get_xlim())
+        self.image_filtered.set_clim(np.nanmin(self.corrected_data), np.nanmax(self.corrected_data))
+        self.canvas.draw_idle()
+
+    def draw_tile(self, image, data, xlimits):
+        # decimated tile of the visible time range, about one column per pixel
+        time, depth, raw_data = self.loaded
+        max_columns = int(self.ax_raw.bbox.width)
+        t_range, tile = self.obj.decimate(time, data, xlimits, max_columns)
+        image.set_data(tile)
+        image.set_extent((t_range[0], t_range[1], depth[0], depth[-1]))
+
+    def update_tiles(self, ax):
+        if self.image_filtered is None or self.loaded is None:
+            return
+        xlimits = ax.get_xlim()
+        self.draw_tile(self.image_raw, self.loaded[2], xlimits)
+        self.draw_tile(self.image_filtered, self.corrected_data, xlimits)
+        self.canvas.draw_idle()
 
     def save_plot(self):
+        if self.fig_raw is None and getattr(self, 'obj', None) is not None:
+            # full resolution contour plots of the visible time range
+            xlimits = self.ax_raw.get_xlim()
+            self.fig_raw = self.obj.plot_data("Raw", 1, self.time, self.depth, self.loaded[2], xlimits=xlimits, levels=300)
+            self.fig_filtered = self.obj.plot_data("Filtered", 2, self.time, self.depth, self.corrected_data, xlimits=xlimits, levels=300)
+
         if self.fig_raw:
             # open file dialog to select directory and file name for saving
             filetypes = [("PNG Files", "*.png")]
@@ -192,9 +287,9 @@ class UDV_GUI:
     def refresh_gui(self):
         self.filepath = None
         self.file_label.config(text="No file selected")
-        self.threshold_entry.delete(0, tk.END)
-        self.threshold_entry.insert(tk.END, "2.0")
         self.interpolation_var.set("linear")
+        self.detector_var.set("jump")
+        self.set_default_threshold("jump")
         self.time_limits_entry.delete(0, tk.END)
         self.time_limits_entry.insert(tk.END, "(0, 20)")
         self.start_depth_entry.delete(0, tk.END)
@@ -202,8 +297,22 @@ class UDV_GUI:
         self.save_plot_button.config(state=tk.DISABLED)
         self.save_data_button.config(state=tk.DISABLED)
         self.fig_raw = None
+        self.fig_filtered = None
         self.fig = None
         self.obj = None
+        # the images of the previous file are removed, the next one creates new images
+        for cb in self.colorbars:
+            cb.remove()
+        self.colorbars = []
+        self.ax_raw.clear()
+        self.ax_filtered.clear()
+        self.image_raw = None
+        self.image_filtered = None
+        self.canvas.draw_idle()
+        self.loaded_key = None
+        self.loaded = None
+        self.incremental_filter = None
+        self.shown_key = None
     
     def close_gui(self):
         self.master.destroy()
@@ -0,0 +1,218 @@
+""" Microbenchmarks of the UDV processing
+
+Usage: ``python benchmark.py [name ...]``, runs all benchmarks if no name is
+given.
+"""
+import sys
+import timeit
+import numpy as np
+
+import udv_analysis_lib as udv
+
+
+def _timeit(fct, number=5):
+    """ Best time of `fct` in seconds """
+    return min(timeit.repeat(fct, number=number, repeat=3)) / number
+
+
+def _jump_pair_reference(jumps):
+    """ Original per-profile loop of `UDV.detect_outliers` """
+    bool_array = np.full((jumps.shape[0]+1, jumps.shape[1]), False)
+    for t in range(jumps.shape[1]):
+        id_jumps = np.where(jumps[:,t])[0]
+        for idx in range(0, len(id_jumps)-1, 2):
+            bool_array[id_jumps[idx]:id_jumps[idx+1]+1, t] = True
+    return bool_array
+
+
+def bench_jump_pairs(profiles=1000):
+    """ Jump pairing kernels of `UDV.detect_outliers` """
+    rng = np.random.default_rng(0)
+    kernels = ['numpy'] + (['numba'] if udv.njit is not None else [])
+
+    print('jump pairs, {:d} profiles'.format(profiles))
+    for gates in [128, 512, 2000]:
+        jumps = rng.random((gates-1, profiles)) < 0.02
+        ref = _jump_pair_reference(jumps)
+
+        times = ['loop {:.2f} ms'.format(
+            _timeit(lambda: _jump_pair_reference(jumps), 1)*1e3)]
+        for kernel in kernels:
+            mask = udv.jump_pair_mask(jumps, kernel)  # also compiles
+            assert np.array_equal(mask, ref), kernel
+            t = _timeit(lambda: udv.jump_pair_mask(jumps, kernel))
+            times.append('{} {:.2f} ms'.format(kernel, t*1e3))
+        print('  {:5d} gates: '.format(gates) + ', '.join(times))
+
+
+def bench_detectors(profiles=20000, gates=256):
+    """ Outlier detectors of `UDV.detect_outliers` on a full field """
+    rng = np.random.default_rng(0)
+    data = rng.normal(0, 5, (gates, profiles))
+    data[rng.random(data.shape) < 0.01] += 300
+    obj = udv.UDV()
+
+    print('detectors, {:d} gates x {:d} profiles'.format(gates, profiles))
+    for detector in udv.DETECTORS:
+        t = _timeit(lambda: obj.detect_outliers(data, 70.0, detector=detector),
+                    1)
+        print('  {:15s} {:8.1f} ms, {:6.1f} Mvalues/s'.format(
+            detector, t*1e3, data.size/t*1e-6))
+
+
+def bench_spacetime(profiles=100000, gates=500):
+    """ Blocked space-time detector of `UDV.detect_outliers` on a long field """
+    rng = np.random.default_rng(0)
+    data = rng.normal(0, 5, (gates, profiles)).astype(np.float32)
+
+    print('spacetime, {:d} gates x {:d} profiles'.format(gates, profiles))
+    for window in [3, 5, 7]:
+        t = _timeit(lambda: udv.spacetime_mask(data, 70.0, window), 1)
+        print('  time window {:d}: {:6.2f} s, {:6.1f} Mvalues/s'.format(
+            window, t, data.size/t*1e-6))
+
+
+def bench_replacement(profiles=20000, gates=256):
+    """ Outlier replacement modes of `UDV.replace_outliers` """
+    rng = np.random.default_rng(0)
+    data = rng.normal(0, 5, (gates, profiles))
+    outliers = rng.random(data.shape) < 0.01
+    outliers[[0, -1]] = False  # the splines do not extrapolate
+    obj = udv.UDV()
+
+    print('replacement, {:d} gates x {:d} profiles'.format(gates, profiles))
+    for method in udv.BULK_METHODS + ('linear', 'time', 'bilinear', 'cubic'):
+        t = _timeit(lambda: obj.replace_outliers(data.copy(), outliers, method),
+                    1)
+        print('  {:10s} {:8.1f} ms'.format(method, t*1e3))
+
+
+def _write_dop3000(fname, profiles, gates, channels, veloOffset=20):
+    """ Write a synthetic DOP3000 file, the channels are interleaved """
+    import struct
+
+    header = bytearray(31268)
+    header[0:16] = b'BINUDOPV6.00\r\n\x00\x00'
+    for ch in range(1, 11):
+        base = 548 + (ch-1)*1024
+        for index, val in [(0, 4000), (5, 1000), (7, 1), (8, 4), (9, 100),
+                           (10, 5), (13, gates), (15, 3141), (18, 8),
+                           (19, 1480), (21, 512), (22, veloOffset), (23, 1),
+                           (27, 2)]:
+            struct.pack_into('i', header, base + 4*index, val)
+        struct.pack_into('4b', header, base + 4*29, 0, 16, 0, 0)
+
+    def block(t, ch, *profiles):
+        body = b''.join(struct.pack('HB', len(raw), ptype) + raw
+                        for ptype, raw in profiles) + struct.pack('H', 0)
+        length = len(body) + 14
+        return (struct.pack('H', length) + body +
+                struct.pack('IHBBBBH', t, 0, 0, 0, 0, ch, length))
+
+    rng = np.random.default_rng(0)
+    depth = (np.arange(gates)*7 + 100).astype(np.int16).tobytes()
+    with open(fname, 'wb') as f:
+        f.write(header)
+        for ch in channels:
+            f.write(block(0, ch, (25, depth)))
+        velo = rng.integers(-128, 128, (profiles, gates)).astype(np.int8)
+        echo = rng.integers(0, 256, (profiles, gates)).astype(np.uint8)
+        t = 0
+        for i in range(profiles):
+            for ch in channels:
+                f.write(block(t, ch, (0, velo[i].tobytes()),
+                              (1, echo[i].tobytes())))
+                t += 100
+
+
+def bench_refine(profiles=2000, gates=500, channels=10, workers=(1, 4, 10)):
+    """ Velocity and echo processing of `DOPpy.DOP3000._refine` """
+    import os
+    import tempfile
+    import DOPpy
+
+    fname = os.path.join(tempfile.mkdtemp(), 'bench.BDD')
+    _write_dop3000(fname, profiles, gates, range(1, channels+1))
+    refine = DOPpy.DOP3000._refine
+    times = []
+
+    def timed_refine(self):
+        t0 = timeit.default_timer()
+        refine(self)
+        times.append(timeit.default_timer() - t0)
+
+    print('refine, {:d} channels x {:d} profiles x {:d} gates'.format(
+        channels, profiles, gates))
+    DOPpy.DOP3000._refine = timed_refine
+    try:
+        for n in workers:
+            del times[:]
+            t = _timeit(lambda: DOPpy.DOP(fname, workers=n), 1)
+            print('  {:2d} workers: load {:7.1f} ms, refine {:7.1f} ms'.format(
+                n, t*1e3, min(times)*1e3))
+    finally:
+        DOPpy.DOP3000._refine = refine
+        os.remove(fname)
+
+
+def bench_server(frames=5000, gates=256, clients=(1, 4, 16)):
+    """ Frame rate and fan-out of `udv_server.ProfileServer` on a Unix socket """
+    import os
+    import asyncio
+    import tempfile
+    import udv_server
+
+    rng = np.random.default_rng(0)
+    profiles = rng.normal(0, 5, (frames, gates))
+    path = os.path.join(tempfile.mkdtemp(), 'bench.sock')
+
+    async def receive(n):
+        reader, writer = await asyncio.open_unix_connection(path)
+        await udv_server.read_frame(reader)  # depths
+        for i in range(n):
+            await udv_server.read_frame(reader)
+        writer.close()
+
+    async def run(n_clients):
+        # the buffers hold all frames, no client is dropped
+        server = udv_server.ProfileServer(np.arange(gates), frames)
+        await server.start_unix(path)
+        tasks = [asyncio.ensure_future(receive(frames))
+                 for i in range(n_clients)]
+        while server.clients < n_clients:
+            await asyncio.sleep(0.001)
+        t0 = timeit.default_timer()
+        publish = 0.0
+        for i, profile in enumerate(profiles):
+            t1 = timeit.default_timer()
+            server.publish(float(i), profile)
+            publish += timeit.default_timer() - t1
+            await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+        t = timeit.default_timer() - t0
+        await server.close()
+        os.remove(path)
+        return t, publish
+
+    print('server, {:d} frames of {:d} gates'.format(frames, gates))
+    for n_clients in clients:
+        t, publish = asyncio.run(run(n_clients))
+        print('  {:2d} clients: {:8.0f} frames/s, publish {:5.1f} us/frame, '
+              '{:5.1f} us/frame/client'.format(
+                  n_clients, frames/t, publish/frames*1e6,
+                  publish/frames/n_clients*1e6))
+
+
+BENCHMARKS = {
+    'jump_pairs': bench_jump_pairs,
+    'detectors': bench_detectors,
+    'spacetime': bench_spacetime,
+    'replacement': bench_replacement,
+    'refine': bench_refine,
+    'server': bench_server,
+    }
+
+
+if __name__ == '__main__':
+    for name in sys.argv[1:] or list(BENCHMARKS):
+        BENCHMARKS[name]()
@@ -0,0 +1,368 @@
+import os
+import threading
+import queue
+from collections import OrderedDict
+from timeit import default_timer
+
+import numpy as np
+
+from DOPpy import DOP, TailReader
+from udv_analysis_lib import UDV, OnlineFilter, estimate_thresholds
+
+_END = object() # marks the last chunk in a queue
+
+_thresholds = OrderedDict() # last estimated thresholds of threshold "auto", see file_thresholds
+_thresholds_lock = threading.Lock()
+THRESHOLD_CACHE_SIZE = 32 # number of estimates kept by file_thresholds
+
+def file_thresholds(bdd, filepath, channel, i_s, i_e, sample_profiles = 2000):
+    """
+    Per-gate thresholds (mm/s) of the profiles i_s:i_e of a BDD file, see udv_analysis_lib.estimate_thresholds
+
+    The thresholds are estimated from sample_profiles evenly spaced profiles, which are read in one pass over the
+    file (DOPpy DOPBase.sampleProfiles). The last THRESHOLD_CACHE_SIZE estimates are kept by path, size and
+    modification time of the file, channel, profile range and sample size, so a changed file is sampled again.
+
+    Arguments
+    ---------
+
+    bdd --> DOPpy DOPBase instance of the file
+    filepath --> path of the file
+    channel --> channel number
+    i_s, i_e --> indices of the first and after the last profile
+    sample_profiles --> maximum number of profiles read for the estimate
+    """
+    stat = os.stat(filepath)
+    key = (os.path.abspath(filepath), stat.st_size, stat.st_mtime, channel, i_s, i_e, sample_profiles)
+    with _thresholds_lock:
+        if key in _thresholds:
+            _thresholds[key] = _thresholds.pop(key) # most recently used
+            return _thresholds[key]
+    indices = np.unique(np.linspace(i_s, i_e-1, min(sample_profiles, i_e-i_s)).astype(int))
+    sample = bdd.sampleProfiles(channel, "velo", indices)*1e3
+    thresholds = estimate_thresholds(sample.T, sample_profiles=len(indices))
+    with _thresholds_lock:
+        _thresholds[key] = thresholds
+        while len(_thresholds) > THRESHOLD_CACHE_SIZE:
+            _thresholds.popitem(last=False)
+    return thresholds
+
+class StageStats:
+    """
+    Time spent by a pipeline stage, see Pipeline.run
+
+    busy --> seconds spent on the work of the stage
+    wait_in --> seconds spent waiting for a chunk from the previous stage
+    wait_out --> seconds spent waiting for space in the queue to the next stage
+    chunks --> number of processed chunks
+    """
+    def __init__(self, name):
+        self.name = name
+        self.busy = 0.0
+        self.wait_in = 0.0
+        self.wait_out = 0.0
+        self.chunks = 0
+        self.wall = 0.0
+
+    def utilisation(self):
+        """
+        Fraction of the total run time the stage was busy
+        """
+        return self.busy/self.wall if self.wall > 0 else 0.0
+
+    def __repr__(self):
+        return "%s: %d chunks, busy %.3f s (%.0f %%), waiting for input %.3f s, waiting for output %.3f s" % (
+            self.name, self.chunks, self.busy, 100*self.utilisation(), self.wait_in, self.wait_out)
+
+class Pipeline:
+    """
+    Reads, filters and writes the velocity of a BDD file in chunks of profiles with overlapping stages
+
+    Every stage runs in its own thread and the stages are connected by bounded queues, so chunk k+1 is decoded
+    while chunk k is filtered (detect_outliers and interpolation) and chunk k-1 is written. Only the measurement
+    blocks of one chunk are decoded at once (the file is read with loadMeas=False) and at most queue_size chunks
+    wait between two stages, so the memory does not depend on the length of the file. The total time approaches
+    the time of the slowest stage instead of the sum of all stages.
+    """
+    sample_profiles = 2000 # number of profiles read to estimate the thresholds
+
+    def __init__(self, start_id_depth = 0, threshold = 70.0, interpolation_method = "linear", chunk_profiles = 1000, queue_size = 2,
+                 detector = "jump", window = None, n_sigma = 3.0, epsilon = 0.1):
+        """
+        Arguments
+        ---------
+
+        start_id_depth, threshold, interpolation_method, detector, window, n_sigma, epsilon --> see UDV.remove_outliers
+                    (threshold "auto" is estimated from a sample of profiles of the whole file, see gate_thresholds)
+                    (detectors with windows in time treat the chunk borders as edges)
+        chunk_profiles --> number of profiles per chunk
+        queue_size --> maximum number of chunks waiting between two stages
+        """
+        self.start_id_depth = start_id_depth
+        self.threshold = threshold
+        self.interpolation_method = interpolation_method
+        self.chunk_profiles = chunk_profiles
+        self.queue_size = queue_size
+        self.detector = detector
+        self.window = window
+        self.n_sigma = n_sigma
+        self.epsilon = epsilon
+        self.stats = {}
+
+    def run(self, filepath, out_path, channel = None, time_limits = None, statistics = None):
+        """
+        Filters the velocity (mm/s) of a channel of a BDD file and writes it to a text file
+
+        The text file has the depths (mm) in the first row and the time (s) in the first column, as save_datafile.
+
+        Arguments
+        ---------
+
+        filepath --> path of the BDD file
+        out_path --> path of the text file
+        channel --> channel number (None: first channel)
+        time_limits --> (t0, t1) tuple, only the profiles inside this time window are processed (None: all profiles)
+        statistics --> udv_statistics.ProfileStatistics updated with the filtered chunks (None: no statistics)
+
+        Return
+        ------
+
+        stats --> dictionary of StageStats of the stages "read", "filter" and "write"
+        """
+        bdd = DOP(filepath, loadMeas=False)
+        if channel is None:
+            channel = bdd.getChannels()[0]
+        time = bdd.getTime(channel)
+        depth = np.array(bdd.getDepth(channel))
+        i_s, i_e = 0, len(time)
+        if time_limits is not None:
+            # binary search of the window, same as DOPBase.read_window
+            i_s = np.searchsorted(time, time_limits[0], side="left")
+            i_e = np.searchsorted(time, time_limits[1], side="right")
+        bounds = list(range(i_s, i_e, self.chunk_profiles)) + [i_e]
+        threshold = self.threshold
+        if isinstance(threshold, str):
+            threshold = self.gate_thresholds(bdd, filepath, channel, i_s, i_e)
+
+        def read():
+            # the chunks are decoded from one open file
+            chunks = bdd.iterProfiles(channel, "velo", self.chunk_profiles, i_s, i_e)
+            for c_s, data in zip(bounds[:-1], chunks):
+                yield time[c_s:c_s+len(data)], np.ascontiguousarray(data.T*1e3)
+
+        obj = UDV()
+        def filter_chunk(chunk):
+            t, data = chunk
+            obj.filter_profiles(data, self.start_id_depth, threshold, self.interpolation_method,
+                                self.detector, self.window, self.n_sigma, self.epsilon)
+            if statistics is not None:
+                statistics.update(data)
+            return t, data
+
+        with open(out_path, "w") as f:
+            np.savetxt(f, np.concatenate(([0.0], depth))[np.newaxis])
+            def write(chunk):
+                t, data = chunk
+                np.savetxt(f, np.column_stack((t, data.T)))
+
+            self.stats = self._run_stages(read(), [("filter", filter_chunk), ("write", write)])
+        return self.stats
+
+    def gate_thresholds(self, bdd, filepath, channel, i_s, i_e):
+        """
+        Per-gate thresholds (mm/s) of the profiles i_s:i_e, see udv_analysis_lib.estimate_thresholds
+
+        The thresholds are estimated from sample_profiles evenly spaced profiles, see file_thresholds.
+        """
+        return file_thresholds(bdd, filepath, channel, i_s, i_e, self.sample_profiles)
+
+    def _run_stages(self, source, stages):
+        """
+        Runs the chunk iterator source and the stages (name, fct(chunk)) in threads connected by bounded queues
+
+        The first exception of any stage stops all stages and is raised again.
+        """
+        names = ["read"] + [name for name, fct in stages]
+        stats = dict((name, StageStats(name)) for name in names)
+        queues = [queue.Queue(self.queue_size) for i in stages]
+        stop = threading.Event()
+        errors = []
+
+        def put(q, item, stat):
+            t0 = default_timer()
+            while not stop.is_set():
+                try:
+                    q.put(item, timeout=0.1)
+                    break
+                except queue.Full:
+                    pass
+            stat.wait_out += default_timer() - t0
+
+        def run_source():
+            stat = stats["read"]
+            try:
+                chunks = iter(source)
+                while not stop.is_set():
+                    t0 = default_timer()
+                    chunk = next(chunks, _END)
+                    stat.busy += default_timer() - t0
+                    if chunk is _END:
+                        break
+                    stat.chunks += 1
+                    put(queues[0], chunk, stat)
+            except BaseException as e:
+                errors.append(e)
+                stop.set()
+            put(queues[0], _END, stat)
+
+        def run_stage(i):
+            name, fct = stages[i]
+            stat = stats[name]
+            q_out = queues[i+1] if i+1 < len(queues) else None
+            try:
+                while not stop.is_set():
+                    t0 = default_timer()
+                    try:
+                        chunk = queues[i].get(timeout=0.1)
+                    except queue.Empty:
+                        stat.wait_in += default_timer() - t0
+                        continue
+                    stat.wait_in += default_timer() - t0
+                    if chunk is _END:
+                        break
+                    t0 = default_timer()
+                    result = fct(chunk)
+                    stat.busy += default_timer() - t0
+                    stat.chunks += 1
+                    if q_out is not None:
+                        put(q_out, result, stat)
+            except BaseException as e:
+                errors.append(e)
+                stop.set()
+            if q_out is not None:
+                put(q_out, _END, stat)
+
+        t_start = default_timer()
+        threads = [threading.Thread(target=run_source)]
+        threads += [threading.Thread(target=run_stage, args=(i,)) for i in range(len(stages))]
+        for th in threads:
+            th.start()
+        for th in threads:
+            th.join()
+        wall = default_timer() - t_start
+        for stat in stats.values():
+            stat.wall = wall
+        if errors:
+            raise errors[0]
+        return stats
+
+class LiveFilter:
+    """
+    Filters the velocity of a BDD file while it is being recorded
+
+    A DOPpy.TailReader picks up the measurement blocks appended to the file and every new velocity profile of the
+    channel is filtered by a udv_analysis_lib.OnlineFilter as soon as its block is complete. The results
+    (time, corrected, is_outlier) with the time in s and the corrected profile in mm/s are passed to the callback
+    and put into the queue. The delay from writing a block to publishing its profile is the polling interval plus
+    the filtering of one profile. An error of the background thread ends it and is raised again by stop.
+    """
+    def __init__(self, filepath, channel = None, start_id_depth = 0, threshold = 70.0, interpolation_method = "linear",
+                 detector = "jump", window = None, n_sigma = 3.0, epsilon = 0.1, callback = None, out_queue = None,
+                 start = "end", interval = 0.005, **kw):
+        """
+        Arguments
+        ---------
+
+        filepath --> path of the BDD file being recorded
+        channel --> channel number (None: first channel)
+        start_id_depth, threshold, interpolation_method, detector, window, n_sigma, epsilon --> see OnlineFilter
+                    (threshold "auto" is estimated from the profiles already recorded, see file_thresholds)
+        callback --> function called with (time, corrected, is_outlier) of every profile (None: no callback)
+        out_queue --> queue.Queue the results are put into without waiting, results that do not fit are dropped
+                      and counted in dropped (None: no queue)
+        start --> "end" filters only the profiles recorded from now on, "begin" all profiles of the file
+        interval --> seconds between two checks of the file while no new block was written
+        kw --> keyword arguments of DOPpy.DOP used to read the file, e.g. replaceParam
+        """
+        self.reader = TailReader(filepath, start, **kw)
+        bdd = self.reader.dop
+        self.channel = bdd.getChannels()[0] if channel is None else channel
+        self.depth = np.array(bdd.getDepth(self.channel))
+        if isinstance(threshold, str):
+            threshold = file_thresholds(bdd, filepath, self.channel, 0, len(bdd.getTime(self.channel)))
+        self.filter = OnlineFilter(start_id_depth, threshold, interpolation_method, detector, window, n_sigma, epsilon)
+        self.callback = callback
+        self.out_queue = out_queue
+        self.interval = interval
+        self.stats = StageStats("filter")
+        self.dropped = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._error = None # error of the background thread, raised by stop
+
+    def step(self):
+        """
+        Filters and publishes the profiles of the blocks written since the last call, returns their number
+        """
+        n = 0
+        for ch, t, profiles in self.reader.poll():
+            if ch == self.channel and "velo" in profiles:
+                self._publish(t, profiles["velo"])
+                n += 1
+        return n
+
+    def _publish(self, t, velo):
+        t0 = default_timer()
+        corrected, is_outlier = self.filter.process(velo*1e3)
+        self.stats.busy += default_timer() - t0
+        self.stats.chunks += 1
+        if self.callback is not None:
+            self.callback(t, corrected, is_outlier)
+        if self.out_queue is not None:
+            try:
+                self.out_queue.put_nowait((t, corrected, is_outlier))
+            except queue.Full:
+                self.dropped += 1
+
+    def run(self):
+        """
+        Filters the new profiles until stop is called
+        """
+        t_start = default_timer()
+        try:
+            for ch, t, profiles in self.reader.follow(self.interval, self._stop):
+                if ch == self.channel and "velo" in profiles:
+                    self._publish(t, profiles["velo"])
+        finally:
+            self.stats.wall += default_timer() - t_start
+
+    def _run_background(self):
+        try:
+            self.run()
+        except Exception as e:
+            self._error = e
+
+    def start(self):
+        """
+        Runs the filter in a background thread
+        """
+        self._stop.clear()
+        self._error = None
+        self._thread = threading.Thread(target=self._run_background)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stops the background thread (after the profiles of the current poll) and closes the file, raises the error
+        that ended the thread if there was one
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.reader.close()
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
@@ -0,0 +1,26 @@
+import os
+import asyncio
+
+import pytest
+
+from DOPpy import DOP
+from DOPasync import estimateMemory
+
+RECORDING = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "recording3000.BDD")
+
+
+async def _iter_all(paths, **kw):
+    return [dop async for path, dop in DOP.aload_iter(paths, **kw)]
+
+
+def test_aload_many_keeps_the_reservation_of_the_returned_instances():
+    # one file fits into the limit, the kept instance and the next file do not
+    limit = estimateMemory(RECORDING)
+    paths = [RECORDING] * 3
+
+    assert len(asyncio.run(DOP.aload_many(paths[:1], workers=1, maxMemory=limit))) == 1
+    with pytest.raises(MemoryError):
+        asyncio.run(DOP.aload_many(paths, workers=1, maxMemory=limit))
+    assert len(asyncio.run(DOP.aload_many(paths, workers=1, maxMemory=3 * limit))) == 3
+    # the iterator releases an instance when the next one is requested
+    assert len(asyncio.run(_iter_all(paths, workers=1, maxMemory=limit))) == 3
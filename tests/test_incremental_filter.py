@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+import udv_analysis_lib as udv
+
+
+@pytest.fixture
+def field_with_nan():
+    rng = np.random.default_rng(1)
+    data = rng.normal(0, 20, (40, 300))
+    data[rng.random(data.shape) < 0.05] = np.nan
+    data[10:14, ::7] += 300
+    return data
+
+
+@pytest.mark.parametrize("start_id_depth", [0, 5])
+@pytest.mark.parametrize("threshold", [30.0, 70.0, 1e9])
+def test_detect_outliers_matches_udv_with_nan(field_with_nan, start_id_depth, threshold):
+    expected = udv.UDV().detect_outliers(field_with_nan[start_id_depth:-4], threshold)
+    result = udv.IncrementalFilter(field_with_nan).detect_outliers(start_id_depth, threshold)
+    np.testing.assert_array_equal(result, expected)
+
+
+def test_detect_outliers_per_gate_matches_udv_with_nan(field_with_nan):
+    thresholds = np.linspace(20, 90, field_with_nan.shape[0]-5)
+    expected = udv.UDV().detect_outliers(field_with_nan[:-4], thresholds)
+    result = udv.IncrementalFilter(field_with_nan).detect_outliers(0, thresholds)
+    np.testing.assert_array_equal(result, expected)
+
+
+def _fresh(data, start_id_depth, threshold, method):
+    return udv.UDV().remove_outliers(np.arange(data.shape[1]), None, data, start_id_depth, threshold, method)
+
+
+def test_remove_outliers_fills_nan_like_udv(field_with_nan):
+    result = udv.IncrementalFilter(field_with_nan).remove_outliers(0, 70.0, "linear")
+    np.testing.assert_array_equal(result, _fresh(field_with_nan, 0, 70.0, "linear"))
+
+
+def test_remove_outliers_sequence_matches_udv_with_nan(field_with_nan):
+    incremental = udv.IncrementalFilter(field_with_nan)
+    calls = [(0, 70.0, "linear"), (0, 30.0, "linear"), (5, 30.0, "linear"), (5, 1e9, "linear"),
+             (5, 70.0, "time"), (5, 70.0, "linear"), (0, 70.0, "ffill"), (0, 70.0, "velo_max"), (0, 30.0, "linear")]
+    for start_id_depth, threshold, method in calls:
+        result = incremental.remove_outliers(start_id_depth, threshold, method)
+        np.testing.assert_array_equal(result, _fresh(field_with_nan, start_id_depth, threshold, method),
+                                      err_msg=str((start_id_depth, threshold, method)))
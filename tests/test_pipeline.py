@@ -0,0 +1,20 @@
+import os
+
+import pytest
+
+from pipeline import LiveFilter
+
+RECORDING = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "recording3000.BDD")
+
+
+def test_live_filter_stop_raises_the_error_of_the_thread():
+    def callback(t, corrected, is_outlier):
+        raise RuntimeError("callback failed")
+
+    live = LiveFilter(RECORDING, start="begin", callback=callback).start()
+    live._thread.join(10)
+    assert not live._thread.is_alive()
+    with pytest.raises(RuntimeError, match="callback failed"):
+        live.stop()
+    # the error is raised once
+    live.stop()
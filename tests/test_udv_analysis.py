@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+from scipy.interpolate import interp1d
+
+import udv_analysis_lib as udv
+
+
+@pytest.fixture
+def field():
+    rng = np.random.default_rng(0)
+    data = rng.normal(0, 5, (20, 50))
+    data[rng.random(data.shape) < 0.02] += 300
+    return data
+
+
+@pytest.mark.parametrize("shape", [(20, 0), (0, 20)])
+@pytest.mark.parametrize("axis", [0, 1])
+def test_hampel_mask_of_empty_data(shape, axis):
+    mask = udv.hampel_mask(np.zeros(shape), 20.0, axis=axis)
+    assert mask.shape == shape and mask.dtype == bool
+
+
+def test_rolling_median_of_empty_time_window(field):
+    time = np.arange(field.shape[1], dtype=float)
+    result = udv.UDV().remove_outliers(time, None, field, 2, 20.0, "linear", time_limits=(100, 200), detector="rolling_median")
+    assert result.shape == (field.shape[0], 0)
+
+
+@pytest.mark.parametrize("method", udv.BULK_METHODS)
+@pytest.mark.parametrize("shape", [(20, 0), (0, 20)])
+def test_bulk_replacement_of_empty_data(method, shape):
+    result = udv.bulk_replacement(np.zeros(shape), np.zeros(shape, dtype=bool), method)
+    assert result.shape == shape
+
+
+def test_ffill_of_empty_time_window(field):
+    time = np.arange(field.shape[1], dtype=float)
+    result = udv.UDV().remove_outliers(time, None, field, 2, 20.0, "ffill", time_limits=(100, 200))
+    assert result.shape == (field.shape[0], 0)
+
+
+@pytest.mark.parametrize("method", ["quadratic", "cubic"])
+def test_online_spline_leaves_edge_outliers_nan(method):
+    rng = np.random.default_rng(0)
+    online = udv.OnlineFilter(0, 30.0, method, "hampel")
+    for i in range(5):
+        profile = rng.normal(0, 5, 64)
+        profile[[0, 30]] += 300
+        corrected, is_outlier = online.process(profile)
+        assert is_outlier[0] and is_outlier[30] and np.isnan(corrected[0])
+        # the gates inside the valid range are interpolated as offline
+        expected = udv.UDV().replace_outliers(profile[1:-4, np.newaxis].copy(), is_outlier[1:-4, np.newaxis], method)
+        np.testing.assert_allclose(corrected[1:-4], expected[:, 0])
+
+
+@pytest.mark.parametrize("method", ["quadratic", "cubic"])
+@pytest.mark.parametrize("seed", range(5))
+def test_spline_filler_matches_interp1d(method, seed):
+    rng = np.random.default_rng(seed)
+    data = rng.normal(0, 20, (60, 40))
+    missing = rng.random(data.shape) < rng.uniform(0.05, 0.5)
+    # interp1d does not extrapolate, the first and last gates are valid
+    missing[[0, -1]] = False
+    missing[:, 0] = False  # a profile without missing gates
+    expected = data.copy()
+    for t in range(data.shape[1]):
+        valid = np.flatnonzero(~missing[:, t])
+        expected[:, t] = interp1d(valid, data[valid, t], kind=method)(np.arange(data.shape[0]))
+    data[missing] = np.nan
+    result = udv.SplineFiller(udv.SPLINE_DEGREES[method], block_size=500).fill(data, missing)
+    np.testing.assert_allclose(result, expected, rtol=1e-9, atol=1e-9)
+
+
+
+@pytest.mark.skipif(udv.njit is None, reason="numba is not installed")
+@pytest.mark.parametrize("seed", range(5))
+def test_jump_pair_mask_numba_matches_numpy(seed):
+    rng = np.random.default_rng(seed)
+    jumps = rng.random((rng.integers(1, 300), rng.integers(1, 50))) < rng.uniform(0.01, 0.3)
+    np.testing.assert_array_equal(udv.jump_pair_mask(jumps, "numba"), udv.jump_pair_mask(jumps, "numpy"))
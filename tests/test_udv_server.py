@@ -0,0 +1,65 @@
+import os
+import socket
+import asyncio
+
+import numpy as np
+
+from DOPpy import DOP
+from udv_server import ProfileServer, read_frame, start_replay
+
+RECORDING = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "recording3000.BDD")
+
+
+async def _read_all(reader):
+    frames = []
+    while True:
+        frame = await read_frame(reader)
+        if frame is None:
+            return frames
+        frames.append(frame)
+
+
+async def _serve_replay(sock_path, dst):
+    # the clients connect before the file is followed, so the depth is given
+    server = ProfileServer(np.array(DOP(RECORDING, loadMeas=False).getDepth(1)), buffer_frames=4)
+    await server.start_unix(sock_path)
+    stalled_reader, stalled_writer = await asyncio.open_unix_connection(sock_path)
+    while server.clients < 1:
+        await asyncio.sleep(0.001)
+    # the stalled client never reads, a small socket buffer makes its frames wait in the transport
+    stalled = next(iter(server._clients))
+    stalled.get_extra_info("socket").setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 1024)
+    fast_reader, fast_writer = await asyncio.open_unix_connection(sock_path)
+    while server.clients < 2:
+        await asyncio.sleep(0.001)
+    fast = asyncio.ensure_future(_read_all(fast_reader))
+
+    thread, stop = start_replay(RECORDING, dst, speed=20.0)
+    server.follow(dst, 1, start="begin", threshold=50.0)
+    n = len(DOP(RECORDING, loadMeas=False).getTime(1))
+    for i in range(1000):
+        if server.frames == n:
+            break
+        await asyncio.sleep(0.01)
+    # the last frames reach the fast client before the connections are closed
+    await asyncio.sleep(0.1)
+    stop.set()
+    thread.join()
+    await server.close()
+    frames = await asyncio.wait_for(fast, 10)
+    fast_writer.close()
+    stalled_writer.close()
+    return server, frames
+
+
+def test_stalled_client_is_dropped_and_fast_client_gets_every_frame(tmp_path):
+    server, frames = asyncio.run(_serve_replay(str(tmp_path / "server.sock"), str(tmp_path / "replay.BDD")))
+    bdd = DOP(RECORDING)
+    time = bdd.getTime(1)
+
+    assert server.dropped_clients == 1
+    # first the depth frame, then one frame per profile
+    assert np.isnan(frames[0][0])
+    np.testing.assert_allclose(frames[0][1], np.float32(bdd.getDepth(1)))
+    assert len(frames) - 1 == len(time) == server.frames
+    np.testing.assert_allclose([t for t, values in frames[1:]], time)
@@ -1,78 +1,804 @@
 import numpy as np
-from scipy.interpolate import CubicSpline, UnivariateSpline, InterpolatedUnivariateSpline, interp1d
+from scipy.interpolate import interp1d
+from scipy import ndimage
+from numpy.lib.stride_tricks import sliding_window_view
 import matplotlib.pyplot as plt
+import warnings
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from multiprocessing import shared_memory
+from DOPpy import reduceMaxAbs
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+def jump_pair_mask_numpy(jumps):
+    """
+    Marks the ranges between pairs of consecutive jumps (1st to 2nd, 3rd to 4th, ...) with a prefix sum of the jump parity
+    
+    Arguments
+    ---------
+    
+    jumps --> boolean array of the form jumps[depth-1, ...], True where the first difference exceeds the threshold
+    
+    Return
+    ------
+    
+    bool_array --> boolean array of the form bool_array[depth, ...], True between (and at) paired jumps. A last unpaired jump is ignored.
+    """
+    jumps = np.concatenate((jumps, np.zeros((1,) + jumps.shape[1:], dtype=bool)))
+    n_incl = np.cumsum(jumps, axis=0, dtype=np.int32) # jumps up to and including the index
+    n_excl = n_incl - jumps # jumps before the index
+    n_paired = n_incl[-1] & ~1 # number of jumps that have a partner
+    in_pair = (n_incl & 1).astype(bool) & (n_incl <= n_paired) # from a first jump up to its partner
+    in_pair |= (n_excl & 1).astype(bool) & (n_excl <= n_paired) # up to and including the partner
+    return in_pair
+
+def _jump_pair_fill(jumps, bool_array):
+    """
+    Loop version of jump_pair_mask_numpy for 2D arrays, compiled with numba if available
+    """
+    idx_s = np.full(jumps.shape[1], -1)
+    for i in range(jumps.shape[0]):
+        for j in range(jumps.shape[1]):
+            if jumps[i,j]:
+                if idx_s[j] < 0:
+                    idx_s[j] = i
+                else:
+                    for k in range(idx_s[j], i+1):
+                        bool_array[k,j] = True
+                    idx_s[j] = -1
+    return bool_array
+
+if njit is not None:
+    _jump_pair_fill = njit(cache=True)(_jump_pair_fill)
+
+def jump_pair_mask_numba(jumps):
+    """
+    Same as jump_pair_mask_numpy with a compiled loop, requires numba
+    """
+    if njit is None:
+        raise ImportError("numba is not installed")
+    jumps_2d = jumps.reshape(jumps.shape[0], -1)
+    bool_array = np.zeros((jumps_2d.shape[0]+1, jumps_2d.shape[1]), dtype=bool)
+    _jump_pair_fill(jumps_2d, bool_array)
+    return bool_array.reshape((jumps.shape[0]+1,) + jumps.shape[1:])
+
+def jump_pair_mask(jumps, kernel = "auto"):
+    """
+    Marks the ranges between pairs of consecutive jumps, see jump_pair_mask_numpy
+    
+    kernel --> "numba", "numpy" or "auto" (numba if installed)
+    """
+    if kernel == "numba" or (kernel == "auto" and njit is not None):
+        return jump_pair_mask_numba(jumps)
+    elif kernel in ("numpy", "auto"):
+        return jump_pair_mask_numpy(jumps)
+    raise ValueError("Unknown kernel %r" % kernel)
+
+DETECTORS = ("jump", "hampel", "rolling_median", "median2d", "spacetime", "uod")
+WINDOWS = {"hampel": 7, "rolling_median": 7, "median2d": 7, "spacetime": 7, "uod": 3} # default window of the detectors
+THRESHOLDS = {"jump": 70.0, "hampel": 70.0, "rolling_median": 70.0, "median2d": 70.0, "spacetime": 70.0, "uod": 2.0} # default threshold of the detectors (mm/s, normalised residual for "uod")
+
+def estimate_thresholds(data, n_sigma = 6.0, sample_profiles = 2000):
+    """
+    Estimates a threshold for the first difference of every pair of neighbouring gates from robust statistics
+    
+    The differences of a sample of evenly spaced profiles give the median m and the median absolute deviation
+    (MAD) of every gate, the threshold is |m| + n_sigma*1.4826*MAD. Gates with a MAD of 0 use the MAD of all gates.
+    
+    Arguments
+    ---------
+    
+    data --> 1D array or 2D array of the form data[depth, time]
+    n_sigma --> number of standard deviations of a jump
+    sample_profiles --> maximum number of profiles used for the estimate
+    
+    Return
+    ------
+    
+    thresholds --> 1D array of length depth-1, thresholds[i] is the threshold of data[i+1] - data[i]
+    """
+    data = np.asarray(data)
+    if data.ndim == 1:
+        data = data[:, np.newaxis]
+    n_time = data.shape[1]
+    columns = np.unique(np.linspace(0, n_time-1, min(sample_profiles, n_time)).astype(int))
+    change = np.diff(data[:, columns].astype(float), axis=0)
+    median = np.nanmedian(change, axis=1)
+    deviation = np.absolute(change - median[:, np.newaxis])
+    mad = np.nanmedian(deviation, axis=1)
+    flat = ~(mad > 0)
+    if flat.any():
+        mad[flat] = np.nanmedian(deviation)
+    return np.absolute(median) + n_sigma*1.4826*mad
+
+def gate_thresholds(threshold, data):
+    """
+    Threshold of the first differences of data as accepted by UDV.detect_outliers: "auto" is replaced by
+    estimate_thresholds(data), other values are returned unchanged
+    """
+    if isinstance(threshold, str):
+        if threshold != "auto":
+            raise ValueError("Unknown threshold %r" % threshold)
+        return estimate_thresholds(data)
+    return threshold
+
+def hampel_mask(data, threshold, window = 7, n_sigma = 3.0, axis = 0, block_size = 2**22):
+    """
+    Hampel filter, marks the values that deviate from the median of the window around them by more than
+    n_sigma times the scaled median absolute deviation (MAD) of the window and by more than threshold
+    
+    Arguments
+    ---------
+    
+    data --> 1D or 2D array, e.g. of the form data[depth, time]
+    threshold --> minimum deviation from the median, avoids marking the noise of windows with a MAD close to 0
+    window --> odd number of values of the window
+    n_sigma --> number of standard deviations (1.4826*MAD) of an outlier
+    axis --> axis of the window, 0 along the depth of a profile, 1 along the time
+    block_size --> maximum number of window values held in memory at once
+    
+    Return
+    ------
+    
+    bool_array --> boolean array of the shape of data with True where an outlier is detected. The edges are
+    padded with the mirrored data, so single spikes at the first and last values are also detected.
+    """
+    if window % 2 == 0 or window < 3:
+        raise ValueError("window must be odd and at least 3, not %r" % window)
+    x = np.moveaxis(np.asarray(data, dtype=float), axis, 0)
+    shape = x.shape
+    if x.size == 0:
+        # e.g. an empty time window, there is nothing to filter
+        return np.zeros(np.shape(data), dtype=bool)
+    x = x.reshape(shape[0], -1)
+    half = window//2
+    # ndimage "reflect" pads as numpy "symmetric"
+    med = ndimage.median_filter(x, size=(window, 1), mode="reflect")
+    padded = np.pad(x, ((half, half), (0, 0)), mode="symmetric")
+    bool_array = np.empty(x.shape, dtype=bool)
+    step = max(1, block_size//(x.shape[0]*window))
+    for c_s in range(0, x.shape[1], step):
+        c_e = min(c_s+step, x.shape[1])
+        windows = sliding_window_view(padded[:, c_s:c_e], window, axis=0)
+        # the window size is odd, the median is the middle value
+        mad = np.partition(np.absolute(windows - med[:, c_s:c_e, np.newaxis]), half, axis=2)[:, :, half]
+        deviation = np.absolute(x[:, c_s:c_e] - med[:, c_s:c_e])
+        bool_array[:, c_s:c_e] = (deviation > n_sigma*1.4826*mad) & (deviation > threshold)
+    return np.moveaxis(bool_array.reshape(shape), 0, axis)
+
+def median2d_mask(data, threshold, window = 5):
+    """
+    Marks the values that deviate by more than threshold from the median of the window x window values
+    around them in depth and time (mirrored at the edges)
+    """
+    med = ndimage.median_filter(data, size=window, mode="reflect")
+    return np.absolute(data - med) > threshold
+
+def running_median(data, window, axis = 0):
+    """
+    Median of the window values around every value along axis, mirrored at the edges
+    
+    The shifted copies of the data are sorted with an odd-even transposition network of element-wise
+    minimum and maximum, which is faster than a selection per window for small odd windows.
+    """
+    if window % 2 == 0:
+        raise ValueError("window must be odd, not %r" % window)
+    half = window//2
+    n = data.shape[axis]
+    pad = [(0, 0)]*data.ndim
+    pad[axis] = (half, half)
+    padded = np.pad(data, pad, mode="symmetric")
+    index = [slice(None)]*data.ndim
+    rows = []
+    for k in range(window):
+        index[axis] = slice(k, k+n)
+        rows.append(padded[tuple(index)])
+    for r in range(window):
+        for i in range(r % 2, window-1, 2):
+            low = np.minimum(rows[i], rows[i+1])
+            rows[i+1] = np.maximum(rows[i], rows[i+1])
+            rows[i] = low
+    return rows[half]
+
+def spacetime_mask(data, threshold, time_window = 3, depth_window = 3, block_size = 2**21):
+    """
+    Marks the values that deviate by more than threshold from a separable median of their neighbours, the
+    running median in time followed by the running median in depth
+    
+    A spike that is smooth in depth but jumps in time is removed by the median in time, a spike of a single
+    value by both medians. The time axis is processed in blocks of about block_size values with an overlap
+    of time_window//2 profiles, so the memory does not depend on the number of profiles.
+    
+    Arguments
+    ---------
+    
+    data --> 2D array of the form data[depth, time]
+    threshold --> minimum deviation of an outlier from the separable median
+    time_window, depth_window --> odd numbers of profiles and gates of the medians
+    block_size --> number of values per block
+    
+    Return
+    ------
+    
+    bool_array --> boolean array of the shape of data with True where an outlier is detected
+    """
+    n_depth, n_time = data.shape
+    halo = time_window//2
+    step = max(1, block_size//max(n_depth, 1))
+    bool_array = np.empty(data.shape, dtype=bool)
+    for t_s in range(0, n_time, step):
+        t_e = min(t_s+step, n_time)
+        # neighbouring profiles of the block, only the edges of the data are mirrored
+        h_s, h_e = max(t_s-halo, 0), min(t_e+halo, n_time)
+        block = data[:, h_s:h_e]
+        if not np.issubdtype(block.dtype, np.floating):
+            block = block.astype(float)
+        background = running_median(running_median(block, time_window, axis=1), depth_window, axis=0)
+        inner = slice(t_s-h_s, t_s-h_s+t_e-t_s)
+        bool_array[:, t_s:t_e] = np.absolute(block[:, inner] - background[:, inner]) > threshold
+    return bool_array
+
+def uod_mask(data, threshold = 2.0, epsilon = 0.1, window = 3, block_size = 2**22, workers = 1):
+    """
+    Universal outlier detection, the normalised median test of Westerweel and Scarano (2005)
+    
+    The neighbours of a value are the other values of the window x window neighbourhood in depth and time.
+    With their median u_m and the median r_m of their residuals |u_i - u_m|, a value u_0 is an outlier if
+    |u_0 - u_m|/(r_m + epsilon) > threshold. The edges are mirrored without repeating the edge value itself.
+    
+    Arguments
+    ---------
+    
+    data --> 1D array (neighbours in depth only) or 2D array of the form data[depth, time]
+    threshold --> threshold of the normalised residual, typically 2
+    epsilon --> acceptable fluctuation level in the units of data (mm/s), avoids marking the noise of uniform regions
+    window --> odd size of the neighbourhood
+    block_size --> maximum number of neighbour values held in memory at once per worker
+    workers --> number of threads that process the blocks of profiles
+    
+    Return
+    ------
+    
+    bool_array --> boolean array of the shape of data with True where an outlier is detected
+    """
+    if window % 2 == 0 or window < 3:
+        raise ValueError("window must be odd and at least 3, not %r" % window)
+    x = np.asarray(data)
+    if x.ndim == 1:
+        x = x[:, np.newaxis]
+    n_depth, n_time = x.shape
+    w_d = window
+    w_t = window if n_time > 1 else 1
+    h_d, h_t = w_d//2, w_t//2
+    # the center of the neighbourhood is not a neighbour
+    offsets = [(i, j) for i in range(w_d) for j in range(w_t) if (i, j) != (h_d, h_t)]
+    step = max(1, block_size//(n_depth*len(offsets)))
+    bool_array = np.empty(x.shape, dtype=bool)
+    
+    def detect_block(t_s):
+        t_e = min(t_s+step, n_time)
+        # neighbouring profiles of the block, only the edges of the data are mirrored
+        p_s, p_e = max(t_s-h_t, 0), min(t_e+h_t, n_time)
+        block = x[:, p_s:p_e].astype(float)
+        padded = np.pad(block, ((h_d, h_d), (h_t-(t_s-p_s), h_t-(p_e-t_e))), mode="reflect")
+        neighbours = np.stack([padded[i:i+n_depth, j:j+t_e-t_s] for i, j in offsets])
+        median = np.median(neighbours, axis=0)
+        np.subtract(neighbours, median, out=neighbours)
+        residual = np.median(np.absolute(neighbours, out=neighbours), axis=0)
+        value = block[:, t_s-p_s:t_e-p_s]
+        bool_array[:, t_s:t_e] = np.absolute(value - median) > threshold*(residual + epsilon)
+    
+    starts = range(0, n_time, step)
+    if workers > 1:
+        with ThreadPoolExecutor(workers) as ex:
+            list(ex.map(detect_block, starts))
+    else:
+        for t_s in starts:
+            detect_block(t_s)
+    return bool_array.reshape(np.shape(data))
+
+SPLINE_DEGREES = {"quadratic": 2, "cubic": 3} # interpolation methods filled by SplineFiller
+TIME_METHODS = ("time", "bilinear", "time_mean", "ffill") # interpolation methods that fill from neighbouring profiles
+BULK_METHODS = ("none", "velo_max", "median", "time_mean", "ffill") # replacements by one value per profile or gate
+
+def bulk_replacement(data_2d, is_outlier_2d, method):
+    """
+    Replaces the outliers of data_2d in place with values computed for all profiles at once
+    
+    Arguments
+    ---------
+    
+    data_2d --> 2D UDV data of the form data_2d[depth, time], overwritten with the corrected data
+    is_outlier_2d --> boolean 2D array of the shape of data_2d with True where an outlier is detected
+    method --> one of BULK_METHODS:
+               "none": NaN
+               "velo_max": value of largest magnitude of the profile
+               "median": median of the profile
+               "time_mean": mean of the gate over all profiles
+               "ffill": last valid value of the gate (the first valid value for the leading profiles)
+               The statistics are computed without the outliers and NaN values, outliers of profiles (velo_max,
+               median) or gates (time_mean, ffill) without valid values are set to NaN.
+    """
+    data_2d[is_outlier_2d] = np.nan
+    if method == "none" or data_2d.size == 0:
+        # the reductions below fail without profiles or gates, e.g. for an empty time window
+        return data_2d
+    rows, cols = np.nonzero(is_outlier_2d)
+    if method == "velo_max":
+        # fmax/fmin skip the NaN values like nanmax/nanmin, without warning for profiles without values
+        high = np.fmax.reduce(data_2d, axis=0)
+        low = np.fmin.reduce(data_2d, axis=0)
+        value = np.where(np.absolute(low) > np.absolute(high), low, high)
+        data_2d[rows, cols] = value[cols]
+    elif method == "median":
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            value = np.nanmedian(data_2d, axis=0)
+        data_2d[rows, cols] = value[cols]
+    elif method == "time_mean":
+        valid = ~np.isnan(data_2d)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            value = np.where(valid, data_2d, 0.0).sum(axis=1)/valid.sum(axis=1)
+        data_2d[rows, cols] = value[rows]
+    elif method == "ffill":
+        n = data_2d.shape[1]
+        idx = np.arange(n)
+        invalid = np.isnan(data_2d)
+        before = np.maximum.accumulate(np.where(invalid, -1, idx), axis=1)[rows, cols]
+        first = np.argmin(invalid, axis=1)[rows]
+        source = np.where(before >= 0, before, first)
+        data_2d[rows, cols] = data_2d[rows, source]
+    else:
+        raise ValueError("Unknown replacement %r" % method)
+    return data_2d
+
+def linear_estimate(data_2d, missing_2d, axis = 0):
+    """
+    Linear interpolation of the missing values between the nearest valid values along axis, vectorised over
+    the other axis
+    
+    The nearest valid index before and after every value is found with a running maximum and minimum of the
+    valid indices, as np.interp the values before the first and after the last valid value take the nearest
+    valid value. Lines without any valid value stay NaN.
+    
+    Arguments
+    ---------
+    
+    data_2d --> 2D UDV data of the form data_2d[depth, time]
+    missing_2d --> boolean 2D array of the shape of data_2d with True where a value is missing
+    axis --> 0 interpolates along the depth of every profile, 1 along the time of every gate
+    
+    Return
+    ------
+    
+    estimate --> 2D array of the shape of data_2d with the interpolated values where missing_2d is True, NaN elsewhere
+    """
+    x = np.moveaxis(data_2d, axis, 1)
+    missing = np.moveaxis(missing_2d, axis, 1)
+    estimate = np.full(data_2d.shape, np.nan)
+    n = x.shape[1]
+    idx = np.arange(n)
+    before = np.maximum.accumulate(np.where(missing, -1, idx), axis=1)
+    after = np.minimum.accumulate(np.where(missing, n, idx)[:, ::-1], axis=1)[:, ::-1]
+    rows, cols = np.nonzero(missing)
+    i_b, i_a = before[rows, cols], after[rows, cols]
+    has_b, has_a = i_b >= 0, i_a < n
+    # leading and trailing gaps use the valid value on their other side
+    i_b, i_a = np.where(has_b, i_b, i_a), np.where(has_a, i_a, i_b)
+    found = has_b | has_a
+    i_b, i_a = np.where(found, i_b, 0), np.where(found, i_a, 0)
+    v_b, v_a = x[rows, i_b], x[rows, i_a]
+    span = i_a - i_b
+    w = np.where(span > 0, (cols - i_b)/np.maximum(span, 1), 0.0)
+    np.moveaxis(estimate, axis, 1)[rows, cols] = np.where(found, v_b + w*(v_a - v_b), np.nan)
+    return estimate
+
+class SplineFiller:
+    """
+    Fills the missing values of profiles on a common depth grid with interpolating splines of degree k (2 or 3),
+    the same as interp1d(kind="quadratic" or "cubic") of every profile
+    
+    The splines of make_interp_spline through the valid gates are determined by their slopes d at the valid
+    gates, which solve a tridiagonal system: the cubic not-a-knot system of CubicSpline, and for the quadratic
+    spline (knots at the midpoints between the valid gates) a continuous curvature at every valid gate. The valid
+    gates of all profiles are packed to the top of the columns and the systems of all profiles are solved
+    together by one elimination over the rows, vectorised over the profiles, so the work per profile is linear
+    in the number of gates as for the linear interpolation.
+    """
+    def __init__(self, k = 3, block_size = 2**22):
+        """
+        Arguments
+        ---------
+        
+        k --> degree of the spline, 2 or 3
+        block_size --> maximum number of values of the profiles solved at once
+        """
+        if k not in (2, 3):
+            raise ValueError("Only quadratic and cubic splines are supported, not k=%r" % k)
+        self.k = k
+        self.block_size = block_size
+        return
+    
+    def fill(self, data_2d, missing_2d):
+        """
+        Replaces the missing values of every profile (column) of data_2d in place
+        
+        Arguments
+        ---------
+        
+        data_2d --> 2D UDV data of the form data_2d[depth, time]
+        missing_2d --> boolean 2D array of the shape of data_2d with True where a value is missing
+        """
+        columns = np.flatnonzero(missing_2d.any(axis=0))
+        if len(columns) == 0:
+            return data_2d
+        step = max(1, self.block_size//data_2d.shape[0])
+        for c_s in range(0, len(columns), step):
+            cols = columns[c_s:c_s+step]
+            block = data_2d[:, cols]
+            self._fill_block(block, missing_2d[:, cols])
+            data_2d[:, cols] = block
+        return data_2d
+    
+    def _slopes(self, dx, slope, last):
+        """
+        Slopes of the splines at the packed valid gates, last[i] is the row of the last valid gate of column i
+        """
+        n = dx.shape[0] + 1
+        rows = np.arange(n)[:, np.newaxis]
+        lower = np.zeros((n,) + dx.shape[1:])
+        diag = np.ones_like(lower)
+        upper = np.zeros_like(lower)
+        rhs = np.zeros_like(lower)
+        if self.k == 3:
+            # CubicSpline: dx[i]*d[i-1] + 2*(dx[i-1]+dx[i])*d[i] + dx[i-1]*d[i+1] = 3*(dx[i]*slope[i-1] + dx[i-1]*slope[i])
+            lower[1:-1] = dx[1:]
+            diag[1:-1] = 2*(dx[:-1] + dx[1:])
+            upper[1:-1] = dx[:-1]
+            rhs[1:-1] = 3*(dx[1:]*slope[:-1] + dx[:-1]*slope[1:])
+            # not-a-knot: the same cubic on the first two and on the last two intervals
+            span = dx[0] + dx[1]
+            diag[0] = dx[1]
+            upper[0] = span
+            rhs[0] = ((dx[0] + 2*span)*dx[1]*slope[0] + dx[0]**2*slope[1])/span
+            take = lambda a, offset: np.take_along_axis(a, (last + offset)[np.newaxis], axis=0)[0]
+            h_1, h_2 = take(dx, -1), take(dx, -2)
+            span = h_1 + h_2
+            end_lower, end_diag = span, h_2
+            end_rhs = (h_1**2*take(slope, -2) + (2*span + h_1)*h_2*take(slope, -1))/span
+        else:
+            # continuous curvature at the valid gates: the curvature right of gate i is (4*slope[i] - 3*d[i] - d[i+1])/dx[i]
+            # and left of gate i+1 it is (d[i] + 3*d[i+1] - 4*slope[i])/dx[i]
+            lower[1:-1] = 1/dx[:-1]
+            diag[1:-1] = 3*(1/dx[:-1] + 1/dx[1:])
+            upper[1:-1] = 1/dx[1:]
+            rhs[1:-1] = 4*(slope[:-1]/dx[:-1] + slope[1:]/dx[1:])
+            # no knot between the first two and between the last two gates: one parabola through them
+            upper[0] = 1
+            rhs[0] = 2*slope[0]
+            end_lower, end_diag = 1.0, 1.0
+            end_rhs = 2*np.take_along_axis(slope, (last - 1)[np.newaxis], axis=0)[0]
+        at_end = rows == last
+        lower = np.where(at_end, end_lower, lower)
+        diag = np.where(at_end, end_diag, diag)
+        upper[at_end] = 0.0
+        rhs = np.where(at_end, end_rhs, rhs)
+        # rows after the last valid gate are the identity
+        padded = rows > last
+        lower[padded] = upper[padded] = rhs[padded] = 0.0
+        diag[padded] = 1.0
+        
+        # Thomas algorithm, vectorised over the columns
+        for i in range(1, n):
+            w = lower[i]/diag[i-1]
+            diag[i] -= w*upper[i-1]
+            rhs[i] -= w*rhs[i-1]
+        d = rhs
+        d[-1] /= diag[-1]
+        for i in range(n-2, -1, -1):
+            d[i] = (rhs[i] - upper[i]*d[i+1])/diag[i]
+        return d
+    
+    def _fill_block(self, data, missing):
+        """
+        Replaces the missing values of the columns of data in place
+        """
+        n, n_col = data.shape
+        valid = ~missing
+        n_valid = valid.sum(axis=0)
+        count = np.cumsum(valid, axis=0) # valid gates up to and including every gate
+        if (n_valid < self.k+1).any() or (missing & ((count == 0) | (count == n_valid))).any():
+            raise ValueError("Missing values outside of the interpolation range")
+        # valid gates and values packed to the top of every column, continued with unit steps after the last one
+        order = np.argsort(missing, axis=0, kind="stable")
+        rows = np.arange(n)[:, np.newaxis]
+        last = n_valid - 1
+        packed = rows <= last
+        x_last = np.take_along_axis(order, last[np.newaxis], axis=0)[0]
+        x = np.where(packed, order, x_last + rows - last).astype(float)
+        y = np.where(packed, np.take_along_axis(data, order, axis=0), 0.0)
+        dx = np.diff(x, axis=0)
+        slope = np.diff(y, axis=0)/dx
+        d = self._slopes(dx, slope, last)
+        
+        # evaluation at the missing gates between the packed valid gates p and p+1
+        i, c = np.nonzero(missing)
+        p = count[i, c] - 1
+        x_p, y_p, d_p = x[p, c], y[p, c], d[p, c]
+        y_n, d_n = y[p+1, c], d[p+1, c]
+        h = x[p+1, c] - x_p
+        s = i - x_p
+        if self.k == 3:
+            # cubic Hermite interpolation
+            t = s/h
+            u = 1 - t
+            data[i, c] = (y_p*(1 + 2*t) + d_p*s)*u*u + (y_n*(3 - 2*t) - d_n*(h - s))*t*t
+        else:
+            # parabola from the left gate up to the midpoint, from the right gate after it
+            slope_p = (y_n - y_p)/h
+            left = y_p + d_p*s + (4*slope_p - 3*d_p - d_n)/h*s*s/2
+            r = h - s
+            right = y_n - d_n*r + (d_p + 3*d_n - 4*slope_p)/h*r*r/2
+            data[i, c] = np.where(s <= h/2, left, right)
+        return data
 
 class UDV:
     def __init__(self):
         return
-    def detect_outliers(self, data, threshold):
+    def detect_outliers(self, data, threshold, kernel = "auto", detector = "jump", window = None, n_sigma = 3.0, epsilon = 0.1):
         """
         Arguments
         ---------
         
-        data --> 1D array
-        threshold --> threshold value for the derivative
+        data --> 1D array or 2D array of the form data[depth, time]
+        threshold --> threshold value for the derivative (jump), of the normalised residual (uod, typically 2)
+                      or for the deviation from the median (other detectors). The jump detector also accepts
+                      an array of one threshold per first difference (length depth-1) or "auto" for the
+                      thresholds of estimate_thresholds(data)
+        kernel --> kernel that pairs the jumps, see jump_pair_mask
+        detector --> one of DETECTORS:
+                     "jump": ranges between pairs of jumps of the first difference in depth larger than threshold
+                     "hampel": Hampel filter along the depth of every profile, see hampel_mask
+                     "rolling_median": Hampel filter (rolling median and MAD) along the time of every gate, see hampel_mask
+                     "median2d": deviation from the 2D median in depth and time, see median2d_mask
+                     "spacetime": deviation from the separable median in time and depth, see spacetime_mask
+                     "uod": normalised median test of the neighbours in depth and time, see uod_mask
+        window --> window size of the median detectors (number of profiles of the median in time for "spacetime",
+                   size of the neighbourhood for "uod"), None for the default of the detector in WINDOWS
+        n_sigma --> number of standard deviations of the Hampel filters
+        epsilon --> acceptable fluctuation level of "uod"
         
         Return
         ------
         
-        bool_array --> boolean 1D array with True indices where an outlier is detected.
+        bool_array --> boolean array of the shape of data with True indices where an outlier is detected.
         """
-        
-        bool_array = np.full(len(data), False)
-        change = np.diff(data)
-        id_jumps = np.where(np.absolute(change)>threshold)[0]
-        for idx in range (0,len(id_jumps) -1, 2):
-            idx_s = id_jumps[idx]
-            idx_e = id_jumps[idx+1]+1
-            bool_array[idx_s:idx_e] = True
-        return bool_array
+        if window is None:
+            window = WINDOWS.get(detector)
+        if detector == "jump":
+            change = np.diff(data, axis=0)
+            threshold = np.asarray(gate_thresholds(threshold, data))
+            if threshold.ndim:
+                # one threshold per gate for all profiles
+                threshold = threshold.reshape((-1,) + (1,)*(change.ndim-1))
+            return jump_pair_mask(np.absolute(change)>threshold, kernel)
+        elif np.ndim(threshold) or isinstance(threshold, str):
+            raise ValueError("Per-gate thresholds are only supported by the jump detector")
+        elif detector == "uod":
+            return uod_mask(data, threshold, epsilon, window)
+        elif detector == "hampel":
+            return hampel_mask(data, threshold, window, n_sigma, axis=0)
+        elif detector in ("rolling_median", "median2d", "spacetime") and np.ndim(data) < 2:
+            raise ValueError("Detector %r requires 2D data" % detector)
+        elif detector == "rolling_median":
+            return hampel_mask(data, threshold, window, n_sigma, axis=1)
+        elif detector == "median2d":
+            return median2d_mask(data, threshold, window)
+        elif detector == "spacetime":
+            return spacetime_mask(data, threshold, window)
+        raise ValueError("Unknown detector %r" % detector)
     
-    def remove_outliers(self, time, depth, raw_data, start_id_depth = 0, threshold = 70.0, interpolation_method = "linear"):
+    def remove_outliers(self, time, depth, raw_data, start_id_depth = 0, threshold = 70.0, interpolation_method = "linear", time_limits = None, workers = 1, executor = "process", detector = "jump", window = None, n_sigma = 3.0, epsilon = 0.1, as_result = False):
         """
         Arguments
         ---------
         
         start_id_depth --> values before start_id_depth will be ignored
-        threshold --> threshold value for the derivative
-        interpolation_method --> type of interpolation for outliers
+        threshold --> threshold value for the derivative (see detect_outliers), per-gate thresholds of the full
+                      profiles (length depth-1) or "auto" to estimate them once from all profiles inside time_limits
+        interpolation_method --> type of interpolation for outliers:
+                                 "none": outliers are set to NaN
+                                 "velo_max": outliers are set to the value of largest magnitude of the profile
+                                 "median", "time_mean", "ffill": see bulk_replacement
+                                 "linear", "quadratic", "cubic": interpolation along the depth of the profile
+                                 "time": linear interpolation along the time from the neighbouring profiles
+                                 "bilinear": mean of the linear interpolations in depth and in time
+                                 Gaps at the edges take the nearest valid value with "linear", "time" and "bilinear".
+                                 With workers > 1 the methods in TIME_METHODS only use the profiles of a chunk.
+        time_limits --> (t0, t1) tuple, only the profiles inside this time window are filtered (None: all profiles)
+        workers --> number of parallel workers, the time axis is split into chunks that are filtered independently
+                    (detectors with windows in time treat the chunk borders as edges)
+        executor --> "process" or "thread" pool for workers > 1 (process workers share the data through shared memory)
+        detector, window, n_sigma, epsilon --> outlier detector and its parameters, see detect_outliers
+        as_result --> if True, an OutlierResult with the corrected data and the detected outliers is returned
         
         Return
         ------
         
-        udv_data --> corrected 2D UDV data
+        udv_data --> corrected 2D UDV data (only the profiles inside time_limits, if given)
         """
+        if time_limits is not None:
+            # binary search of the window, same as DOPBase.read_window
+            t_s = np.searchsorted(time, time_limits[0], side="left")
+            t_e = np.searchsorted(time, time_limits[1], side="right")
+            time = time[t_s:t_e]
+            raw_data = raw_data[:,t_s:t_e]
         corrected_data = raw_data.copy()
-        for t,time in enumerate(time):
-            #print("%d\t%.5f" %(t, time))
-            data = raw_data[start_id_depth:-4,t]
-            depth = depth[start_id_depth:-4]
-            is_outlier = self.detect_outliers(data.copy(), threshold)
-            idx = np.where(is_outlier==True)[0]
-            data[idx] = np.nan
-            if(interpolation_method == "none"):
-                interpolated_data = data
-            elif(interpolation_method == "velo_max"):
-                max_val = np.nanmax(data)
-                min_val = np.nanmin(data)
-                if(abs(min_val)>abs(max_val)):
-                    d = min_val
-                else:
-                    d = max_val
-                data[idx] = d
-                interpolated_data = data
-            else:
-                interpolated_data = self.interpolation(data, interpolation_method)
-            corrected_data[start_id_depth:-4,t] = interpolated_data
+        # the chunks of the workers share the thresholds
+        threshold = gate_thresholds(threshold, corrected_data)
+        detector_args = (detector, window, n_sigma, epsilon)
+        outlier_mask = np.zeros(raw_data.shape, dtype=bool) if as_result else None
+        if workers > 1 and len(time) > 1:
+            self._filter_parallel(corrected_data, start_id_depth, threshold, interpolation_method, workers, executor, *detector_args, outlier_mask=outlier_mask)
+        else:
+            self.filter_profiles(corrected_data, start_id_depth, threshold, interpolation_method, *detector_args, outlier_mask=outlier_mask)
+        if as_result:
+            return OutlierResult(corrected_data, raw_data, outlier_mask, time)
         return corrected_data
     
+    def filter_profiles(self, data_2d, start_id_depth = 0, threshold = 70.0, interpolation_method = "linear", detector = "jump", window = None, n_sigma = 3.0, epsilon = 0.1, outlier_mask = None):
+        """
+        Removes the outliers of every profile (column) of data_2d in place
+        
+        Arguments
+        ---------
+        
+        data_2d --> 2D UDV data of the form data_2d[depth, time], overwritten with the corrected data
+        start_id_depth, threshold, interpolation_method, detector, window, n_sigma, epsilon --> see remove_outliers
+        outlier_mask --> boolean array of the shape of data_2d, the detected outliers are written to its filtered gates
+        """
+        threshold = gate_thresholds(threshold, data_2d)
+        if np.ndim(threshold):
+            # per-gate thresholds of the full profiles
+            threshold = np.asarray(threshold)[start_id_depth:data_2d.shape[0]-5]
+        # detection is done for all profiles at once
+        is_outlier_2d = self.detect_outliers(data_2d[start_id_depth:-4], threshold, detector=detector, window=window, n_sigma=n_sigma, epsilon=epsilon)
+        if outlier_mask is not None:
+            outlier_mask[start_id_depth:-4] = is_outlier_2d
+        self.replace_outliers(data_2d[start_id_depth:-4], is_outlier_2d, interpolation_method)
+        return data_2d
+    
+    def replace_outliers(self, data_2d, is_outlier_2d, interpolation_method = "linear"):
+        """
+        Replaces the detected outliers of every profile (column) of data_2d in place
+        
+        Arguments
+        ---------
+        
+        data_2d --> 2D UDV data of the form data_2d[depth, time], overwritten with the corrected data
+        is_outlier_2d --> boolean 2D array of the shape of data_2d with True where an outlier is detected
+        interpolation_method --> see remove_outliers
+        """
+        if interpolation_method in BULK_METHODS:
+            return bulk_replacement(data_2d, is_outlier_2d, interpolation_method)
+        if interpolation_method in ("linear", "time", "bilinear"):
+            missing_2d = is_outlier_2d | np.isnan(data_2d)
+            if interpolation_method == "linear":
+                estimate = linear_estimate(data_2d, missing_2d, axis=0)
+            elif interpolation_method == "time":
+                estimate = linear_estimate(data_2d, missing_2d, axis=1)
+            else:
+                # mean of the estimates in depth and time, or the one that exists
+                in_depth = linear_estimate(data_2d, missing_2d, axis=0)
+                estimate = linear_estimate(data_2d, missing_2d, axis=1)
+                estimate = np.where(np.isnan(estimate), in_depth, np.where(np.isnan(in_depth), estimate, 0.5*(estimate + in_depth)))
+            data_2d[missing_2d] = estimate[missing_2d]
+            return data_2d
+        if interpolation_method in SPLINE_DEGREES:
+            # the spline systems of all profiles are solved together
+            data_2d[is_outlier_2d] = np.nan
+            return SplineFiller(SPLINE_DEGREES[interpolation_method]).fill(data_2d, np.isnan(data_2d))
+        for t in range(data_2d.shape[1]):
+            data = data_2d[:,t]
+            idx = np.where(is_outlier_2d[:,t])[0]
+            data[idx] = np.nan
+            # other kinds of interp1d
+            interpolated_data = self.interpolation(data, interpolation_method)
+            data_2d[:,t] = interpolated_data
+        return data_2d
+    
+    def _filter_parallel(self, data_2d, start_id_depth, threshold, interpolation_method, workers, executor, detector = "jump", window = None, n_sigma = 3.0, epsilon = 0.1, outlier_mask = None):
+        """
+        Filters chunks of the time axis of data_2d in place on a thread or process pool
+        
+        The detected outliers are written to outlier_mask, which is only shared with the workers if it is given.
+        """
+        # more chunks than workers to balance the load
+        n_chunks = min(data_2d.shape[1], 4*workers)
+        bounds = np.linspace(0, data_2d.shape[1], n_chunks+1).astype(int)
+        chunks = list(zip(bounds[:-1], bounds[1:]))
+        params = (start_id_depth, threshold, interpolation_method, detector, window, n_sigma, epsilon)
+        if executor == "thread":
+            def filter_chunk(c):
+                mask = None if outlier_mask is None else outlier_mask[:,c[0]:c[1]]
+                self.filter_profiles(data_2d[:,c[0]:c[1]], *params, outlier_mask=mask)
+            with ThreadPoolExecutor(workers) as ex:
+                list(ex.map(filter_chunk, chunks))
+        elif executor == "process":
+            # the workers attach to a shared memory copy instead of pickling the data, the outlier mask follows the data
+            with_mask = outlier_mask is not None
+            shm = shared_memory.SharedMemory(create=True, size=data_2d.nbytes + (outlier_mask.size if with_mask else 0))
+            try:
+                shared = np.ndarray(data_2d.shape, dtype=data_2d.dtype, buffer=shm.buf)
+                shared[:] = data_2d
+                if with_mask:
+                    shared_mask = np.ndarray(data_2d.shape, dtype=bool, buffer=shm.buf, offset=data_2d.nbytes)
+                    shared_mask[:] = False
+                args = [(shm.name, data_2d.shape, data_2d.dtype.str, t_s, t_e) + params + (with_mask,) for t_s, t_e in chunks]
+                with ProcessPoolExecutor(workers) as ex:
+                    list(ex.map(_filter_shared_chunk, *zip(*args)))
+                data_2d[:] = shared
+                del shared
+                if with_mask:
+                    outlier_mask[:] = shared_mask
+                    del shared_mask
+            finally:
+                shm.close()
+                shm.unlink()
+        else:
+            raise ValueError("Unknown executor %r" % executor)
+        return data_2d
+    
     def interpolation(self, data, interpolation_method = "linear"):
         not_nan_indices = np.where(~np.isnan(data))[0]
         interpolation_func = interp1d(not_nan_indices, data[not_nan_indices], kind=interpolation_method)
         interpolated_data = interpolation_func(np.arange(len(data)))
         return interpolated_data
     
-    def plot_data(self, fig_title, fig_num, time, depth, data, xlimits, levels=300):
+    def decimate(self, time, data, xlimits, max_columns):
+        """
+        Reduces the profiles inside xlimits to at most about max_columns columns
+        for drawing, every column keeps the value of largest magnitude of its bin
+        
+        Arguments
+        ---------
+        time --> time of the profiles
+        data --> 2D data array, depth x time
+        xlimits --> visible time range
+        max_columns --> number of columns to draw, e.g. the width of the axes in pixels
+        
+        Returns
+        -------
+        (t_first, t_last) --> time range covered by the tile
+        tile --> 2D array, depth x columns
+        """
+        # one partially visible profile is kept on each side
+        i_s = max(np.searchsorted(time, xlimits[0], side='right')-1, 0)
+        i_e = min(np.searchsorted(time, xlimits[1], side='left')+1, len(time))
+        visible = data[:, i_s:i_e]
+        step = max(int(np.ceil(visible.shape[1]/max(max_columns, 1))), 1)
+        if step == 1:
+            return (time[i_s], time[i_e-1]), visible
+        
+        # bins of step profiles, the last bin may be partial
+        tile = reduceMaxAbs(visible, np.arange(0, visible.shape[1], step), axis=1)
+        return (time[i_s], time[i_e-1]), tile
+    
+    def plot_data(self, fig_title, fig_num, time, depth, data, xlimits, levels=300, pyramid=None, max_times=1000):
+        """
+        Contour plot of 2D data (depth x time) inside xlimits
+        
+        If data is None, the raw velocity of a pyramid (see DOPpy DOPBase.pyramid) is plotted in mm/s
+        instead: the level matching xlimits with at most max_times timesteps of the largest magnitude
+        in each time bin (time may be None as well). Given data is always plotted.
+        """
+        if data is None:
+            if pyramid is None:
+                raise ValueError("Either data or a pyramid is required")
+            time, data = pyramid.window(xlimits[0], xlimits[1], max_times, 'maxabs')
+            data = data.T*1e3
         fig = plt.figure(fig_num)
         plt.clf()
         plt.gcf().set_size_inches([16,4])
@@ -99,4 +825,316 @@ class UDV:
         for i in range(1, data.shape[0]):
             data_to_write[i,1:] = data[i,:]
     
-        np.savetxt(open(filename,"w"), data_to_write)
\ No newline at end of file
+        np.savetxt(open(filename,"w"), data_to_write)
+
+class IncrementalFilter:
+    """
+    Repeated outlier removal of one UDV field with changing start depth and threshold
+    
+    The absolute first differences of all profiles and their sorted order are computed once. A new threshold then
+    only selects the jumps above it from the sorted order and a new start depth only cuts off the rows above it.
+    Profiles whose outlier mask did not change since the last call are not filtered again.
+    
+    The differences, their sorted copy and their int64 sorted order together take about 3 times the memory of
+    a float64 raw_data.
+    """
+    def __init__(self, raw_data, kernel = "auto", time = None):
+        """
+        Arguments
+        ---------
+        
+        raw_data --> 2D UDV data of the form raw_data[depth, time] (the last 4 gates are ignored, see UDV.remove_outliers)
+        kernel --> kernel that pairs the jumps, see jump_pair_mask
+        time --> time of the profiles, passed to the OutlierResult of remove_outliers (None: no time)
+        """
+        self.raw_data = raw_data
+        self.kernel = kernel
+        self.time = time
+        self.abs_change = np.absolute(np.diff(raw_data[:-4], axis=0))
+        # NaN differences are never jumps, argsort puts them last and they are left out
+        order = np.argsort(self.abs_change, axis=None)
+        n_finite = order.size - np.count_nonzero(np.isnan(self.abs_change))
+        self.order = order[:n_finite]
+        self.sorted_change = self.abs_change.ravel()[self.order]
+        self._last = None # (start_id_depth, interpolation_method, is_outlier_2d, corrected_data)
+        self._thresholds = None # estimated once for threshold "auto"
+        return
+    
+    def detect_outliers(self, start_id_depth = 0, threshold = 70.0, detector = "jump", window = None, n_sigma = 3.0, epsilon = 0.1):
+        """
+        Same as UDV.detect_outliers(raw_data[start_id_depth:-4], threshold) without computing the differences
+        
+        threshold may also be per-gate thresholds or "auto", see UDV.remove_outliers. The estimated thresholds
+        of "auto" are kept for all further calls. The other detectors than "jump" are computed from the raw data,
+        see UDV.detect_outliers.
+        """
+        if isinstance(threshold, str):
+            if self._thresholds is None:
+                self._thresholds = gate_thresholds(threshold, self.raw_data)
+            threshold = self._thresholds
+        if detector != "jump":
+            return UDV().detect_outliers(self.raw_data[start_id_depth:-4], threshold, detector=detector, window=window, n_sigma=n_sigma, epsilon=epsilon)
+        if np.ndim(threshold):
+            jumps = self.abs_change > np.asarray(threshold)[:self.abs_change.shape[0], np.newaxis]
+        else:
+            n_below = np.searchsorted(self.sorted_change, threshold, side="right")
+            jumps = np.zeros(self.abs_change.shape, dtype=bool)
+            jumps.ravel()[self.order[n_below:]] = True
+        return jump_pair_mask(jumps[start_id_depth:], self.kernel)
+    
+    def remove_outliers(self, start_id_depth = 0, threshold = 70.0, interpolation_method = "linear", detector = "jump", window = None, n_sigma = 3.0, epsilon = 0.1, as_result = False):
+        """
+        Same as UDV.remove_outliers(time, depth, raw_data, start_id_depth, threshold, interpolation_method, detector=detector, window=window, n_sigma=n_sigma, epsilon=epsilon, as_result=as_result)
+        
+        Return
+        ------
+        
+        udv_data --> corrected 2D UDV data
+        """
+        is_outlier_2d = self.detect_outliers(start_id_depth, threshold, detector, window, n_sigma, epsilon)
+        # replace_outliers also fills the NaN values of the raw data
+        missing_2d = is_outlier_2d | np.isnan(self.raw_data[start_id_depth:-4])
+        if interpolation_method in TIME_METHODS:
+            # the neighbouring profiles are part of the interpolation, all profiles are filtered again
+            corrected_data = self.raw_data.copy()
+            UDV().replace_outliers(corrected_data[start_id_depth:-4], is_outlier_2d, interpolation_method)
+            self._last = (start_id_depth, interpolation_method, missing_2d, corrected_data)
+            return self._result(corrected_data, start_id_depth, is_outlier_2d, as_result)
+        # profiles without missing values stay unchanged
+        redo = missing_2d.any(axis=0)
+        if self._last is None or self._last[1] in TIME_METHODS:
+            # the last result also holds fills of the profiles without missing values
+            corrected_data = self.raw_data.copy()
+        else:
+            last_start, last_method, last_missing_2d, last_data = self._last
+            corrected_data = last_data.copy()
+            # profiles that lost all their missing values are restored
+            restore = last_missing_2d.any(axis=0) & ~redo
+            corrected_data[:, restore] = self.raw_data[:, restore]
+            if last_start == start_id_depth and last_method == interpolation_method:
+                # profiles with unchanged missing values are already filtered
+                redo &= (missing_2d != last_missing_2d).any(axis=0)
+        
+        block = self.raw_data[start_id_depth:-4, redo]
+        UDV().replace_outliers(block, is_outlier_2d[:, redo], interpolation_method)
+        corrected_data[:, redo] = self.raw_data[:, redo]
+        corrected_data[start_id_depth:-4, redo] = block
+        self._last = (start_id_depth, interpolation_method, missing_2d, corrected_data)
+        return self._result(corrected_data, start_id_depth, is_outlier_2d, as_result)
+    
+    def _result(self, corrected_data, start_id_depth, is_outlier_2d, as_result):
+        """
+        corrected_data or the OutlierResult of remove_outliers
+        """
+        if not as_result:
+            return corrected_data
+        outlier_mask = np.zeros(self.raw_data.shape, dtype=bool)
+        outlier_mask[start_id_depth:-4] = is_outlier_2d
+        return OutlierResult(corrected_data, self.raw_data, outlier_mask, self.time)
+
+class OutlierResult:
+    """
+    Corrected data of UDV.remove_outliers together with the detected outliers
+    
+    The outlier mask is stored packed with np.packbits along the depth (1 bit per value) with the number of
+    outliers of every profile. The raw data is referenced, not copied, and the unpacked mask and the masked
+    array are computed when they are accessed.
+    """
+    def __init__(self, data, raw_data, outlier_mask, time = None):
+        """
+        Arguments
+        ---------
+        
+        data --> corrected 2D UDV data of the form data[depth, time]
+        raw_data --> 2D UDV data before the correction
+        outlier_mask --> boolean 2D array of the shape of data with True where an outlier was detected
+        time --> time of the profiles (None: the profiles are only accessed by index)
+        """
+        self.data = data
+        self._raw = raw_data
+        self.time = None if time is None else np.asarray(time)
+        self.shape = data.shape
+        self.packed_mask = np.packbits(outlier_mask, axis=0)
+        self.counts = np.count_nonzero(outlier_mask, axis=0)
+        return
+    
+    @property
+    def raw(self):
+        """
+        Raw data (the array given to remove_outliers, or a view of it)
+        """
+        return self._raw
+    
+    @property
+    def mask(self):
+        """
+        Boolean 2D array with True where an outlier was detected, unpacked at every access
+        """
+        return np.unpackbits(self.packed_mask, axis=0, count=self.shape[0]).view(bool)
+    
+    @property
+    def masked_raw(self):
+        """
+        Masked array of the raw data with the outliers masked
+        """
+        return np.ma.masked_array(self._raw, mask=self.mask)
+    
+    def profile_mask(self, index):
+        """
+        Boolean mask of the outliers of the profile index, only this profile is unpacked
+        """
+        return np.unpackbits(self.packed_mask[:, index], count=self.shape[0]).view(bool)
+    
+    def outlier_fraction(self, time = None):
+        """
+        Fraction of the gates of a profile that are outliers
+        
+        Arguments
+        ---------
+        
+        time --> None for all profiles, or time (scalar or array) of the profiles: the last profile at or before
+                 every time is used
+        
+        Return
+        ------
+        
+        fraction --> fraction of every profile (or of the profiles at time)
+        """
+        fraction = self.counts/float(self.shape[0])
+        if time is None:
+            return fraction
+        if self.time is None:
+            raise ValueError("The result has no time")
+        index = np.clip(np.searchsorted(self.time, time, side="right")-1, 0, len(self.time)-1)
+        return fraction[index]
+
+class OnlineFilter:
+    """
+    Outlier removal of single profiles as they are recorded, e.g. from DOPpy.TailReader
+    
+    Every profile is filtered when it arrives with the work of one profile: the detectors in depth ("jump",
+    "hampel") only use the profile itself, "rolling_median" compares every gate with the median and MAD of the
+    last window profiles (a causal window, the offline detector is centred), and the replacements "ffill" and
+    "time_mean" keep the last valid value and the running sum of every gate. Detectors and interpolations that
+    need later profiles ("median2d", "spacetime", "uod", "time", "bilinear") are not available. The splines
+    ("quadratic", "cubic") do not extrapolate, outliers before the first or after the last valid gate of a
+    profile (or of a profile with too few valid gates) are set to NaN instead of raising an error.
+    """
+    DETECTORS = ("jump", "hampel", "rolling_median")
+    
+    def __init__(self, start_id_depth = 0, threshold = 70.0, interpolation_method = "linear", detector = "jump", window = None, n_sigma = 3.0, epsilon = 0.1, kernel = "auto"):
+        """
+        Arguments
+        ---------
+        
+        start_id_depth, threshold, interpolation_method, detector, window, n_sigma, epsilon --> see UDV.remove_outliers
+                    (threshold "auto" is not available, use per-gate thresholds from estimate_thresholds)
+        kernel --> kernel that pairs the jumps, see jump_pair_mask
+        """
+        if detector not in self.DETECTORS:
+            raise ValueError("Detector %r is not available for single profiles, use one of %s" % (detector, self.DETECTORS))
+        if interpolation_method in ("time", "bilinear"):
+            raise ValueError("Interpolation %r needs later profiles" % interpolation_method)
+        if isinstance(threshold, str):
+            raise ValueError("Threshold %r is not available for single profiles, use estimate_thresholds" % threshold)
+        self.start_id_depth = start_id_depth
+        self.threshold = threshold
+        self.interpolation_method = interpolation_method
+        self.detector = detector
+        self.window = WINDOWS.get(detector) if window is None else window
+        self.n_sigma = n_sigma
+        self.epsilon = epsilon
+        self.kernel = kernel
+        self.count = 0 # number of filtered profiles
+        self._history = None # last window raw profiles of "rolling_median", ring buffer of the form [window, depth]
+        self._last_valid = None # last valid value of every gate ("ffill")
+        self._sum = None # sum and number of the valid values of every gate ("time_mean")
+        self._n_valid = None
+        return
+    
+    def reset(self):
+        """
+        Forgets the previous profiles
+        """
+        self.count = 0
+        self._history = self._last_valid = self._sum = self._n_valid = None
+    
+    def process(self, profile):
+        """
+        Filters one profile
+        
+        Arguments
+        ---------
+        
+        profile --> 1D array of one profile (all gates, the last 4 gates are ignored as in UDV.remove_outliers)
+        
+        Return
+        ------
+        
+        corrected --> corrected copy of the profile
+        is_outlier --> boolean array of the shape of profile with True where an outlier is detected
+        """
+        corrected = np.array(profile, dtype=float)
+        data = corrected[self.start_id_depth:-4]
+        threshold = self.threshold
+        if np.ndim(threshold):
+            threshold = np.asarray(threshold)[self.start_id_depth:len(corrected)-5]
+        if self.detector == "rolling_median":
+            if self._history is None:
+                self._history = np.empty((self.window, len(data)))
+            self._history[self.count % self.window] = data
+            past = self._history[:min(self.count+1, self.window)]
+            # the window is not symmetric, the median of an even number of profiles is the mean of the middle values
+            med = np.median(past, axis=0)
+            mad = np.median(np.absolute(past - med), axis=0)
+            deviation = np.absolute(data - med)
+            is_outlier = (deviation > self.n_sigma*1.4826*mad) & (deviation > threshold)
+        else:
+            is_outlier = UDV().detect_outliers(data, threshold, self.kernel, self.detector, self.window, self.n_sigma, self.epsilon)
+        self.count += 1
+        
+        if self.interpolation_method in ("ffill", "time_mean"):
+            valid = ~is_outlier & ~np.isnan(data)
+            if self._last_valid is None:
+                self._last_valid = np.full(len(data), np.nan)
+                self._sum = np.zeros(len(data))
+                self._n_valid = np.zeros(len(data), dtype=np.int64)
+            self._last_valid[valid] = data[valid]
+            self._sum[valid] += data[valid]
+            self._n_valid += valid
+            # gates without valid values so far are set to NaN
+            if self.interpolation_method == "ffill":
+                data[is_outlier] = self._last_valid[is_outlier]
+            else:
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    data[is_outlier] = self._sum[is_outlier]/self._n_valid[is_outlier]
+        elif self.interpolation_method in SPLINE_DEGREES:
+            # only the gates between the first and the last valid gate are interpolated, the others stay NaN
+            data[is_outlier] = np.nan
+            inside = np.flatnonzero(~np.isnan(data))
+            if len(inside) > SPLINE_DEGREES[self.interpolation_method]:
+                inside = slice(inside[0], inside[-1]+1)
+                UDV().replace_outliers(data[inside, np.newaxis], is_outlier[inside, np.newaxis], self.interpolation_method)
+        else:
+            UDV().replace_outliers(data[:, np.newaxis], is_outlier[:, np.newaxis], self.interpolation_method)
+        
+        mask = np.zeros(len(corrected), dtype=bool)
+        mask[self.start_id_depth:len(corrected)-4] = is_outlier
+        return corrected, mask
+
+
+def _filter_shared_chunk(shm_name, shape, dtype, t_s, t_e, start_id_depth, threshold, interpolation_method, detector = "jump", window = None, n_sigma = 3.0, epsilon = 0.1, with_mask = False):
+    """
+    Process pool worker of UDV.remove_outliers, filters the profiles t_s:t_e of the shared data in place
+    and writes their outliers to the shared mask behind the data if with_mask is True
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        data_2d = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        mask = None
+        if with_mask:
+            mask = np.ndarray(shape, dtype=bool, buffer=shm.buf, offset=data_2d.nbytes)[:,t_s:t_e]
+        UDV().filter_profiles(data_2d[:,t_s:t_e], start_id_depth, threshold, interpolation_method, detector, window, n_sigma, epsilon, mask)
+        del data_2d, mask
+    finally:
+        shm.close()
\ No newline at end of file
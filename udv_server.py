@@ -0,0 +1,280 @@
+"""
+Streaming of filtered UDV profiles to many subscribers over TCP or a Unix socket
+
+ProfileServer is an asyncio server that sends every published profile to all connected clients as a binary frame:
+
+- header FRAME_HEADER: time (s, float64) and number of gates n (uint32), little-endian
+- n float32 values, the corrected velocity (mm/s) of the gates, NaN for removed outliers
+
+The first frame of every connection has the time NaN and holds the depths of the gates (mm). A frame is packed once
+and written to the transport of every client without waiting. The bytes a client has not taken yet stay in the write
+buffer of its transport, which is bounded to buffer_frames frames: a client whose buffer is full is too slow for the
+stream and is disconnected, so slow consumers never delay the other clients or the filter.
+
+ProfileServer.follow filters a BDD file while it is being recorded (pipeline.LiveFilter) and publishes its profiles,
+e.g.
+
+    python udv_server.py recording.BDD --port 5000
+
+A recording is simulated with --replay, which writes the file into a temporary file at real-time speed
+(start_replay, DOPpy.replayBDD) and streams that one:
+
+    python udv_server.py measurement.BDD --replay --speed 2
+
+Clients read the frames with read_frame(reader) from asyncio.open_connection or asyncio.open_unix_connection.
+"""
+import os
+import sys
+import shutil
+import struct
+import asyncio
+import argparse
+import tempfile
+import threading
+
+import numpy as np
+
+from DOPpy import replayBDD
+from pipeline import LiveFilter
+
+FRAME_HEADER = struct.Struct("<dI") # time and number of gates of a frame
+
+def pack_frame(t, profile):
+    """
+    Binary frame of the profile at time t, see the module docstring
+    """
+    values = np.asarray(profile, dtype="<f4")
+    return FRAME_HEADER.pack(t, len(values)) + values.tobytes()
+
+def unpack_frame(buf):
+    """
+    Time and float32 values of a frame packed by pack_frame
+    """
+    t, n = FRAME_HEADER.unpack_from(buf)
+    return t, np.frombuffer(buf, dtype="<f4", count=n, offset=FRAME_HEADER.size)
+
+async def read_frame(reader):
+    """
+    Reads the next frame from an asyncio.StreamReader
+
+    Return
+    ------
+
+    (t, values) --> time and float32 values of the frame, None if the server closed the connection
+    """
+    try:
+        header = await reader.readexactly(FRAME_HEADER.size)
+        t, n = FRAME_HEADER.unpack(header)
+        values = np.frombuffer(await reader.readexactly(4*n), dtype="<f4")
+    except asyncio.IncompleteReadError:
+        return None
+    return t, values
+
+def start_replay(src, dst, speed = 1.0):
+    """
+    Replays the BDD file src into dst in a daemon thread to simulate a recording, see DOPpy.replayBDD
+
+    Returns when dst can be opened.
+
+    Return
+    ------
+
+    (thread, stop) --> thread of the replay and the threading.Event that ends it
+    """
+    stop, ready = threading.Event(), threading.Event()
+    thread = threading.Thread(target=replayBDD, args=(src, dst, speed, stop, ready))
+    thread.daemon = True
+    thread.start()
+    while not ready.wait(0.01):
+        if not thread.is_alive():
+            raise RuntimeError("The replay of %s ended before %s was written" % (src, dst))
+    return thread, stop
+
+class ProfileServer:
+    """
+    Sends the published profiles to all connected clients, see the module docstring
+    """
+    def __init__(self, depth = None, buffer_frames = 64):
+        """
+        Arguments
+        ---------
+
+        depth --> depths of the gates (mm) sent as first frame of every connection (None: set by follow, or no
+                  depth frame)
+        buffer_frames --> maximum number of frames waiting in the write buffer of a client before it is disconnected
+                          (in addition to the socket buffers of the operating system)
+        """
+        self.depth = depth
+        self.buffer_frames = buffer_frames
+        self.frames = 0 # number of published frames
+        self.dropped_clients = 0 # number of clients disconnected for being too slow
+        self.live = None
+        self._clients = set() # writers of the connected clients
+        self._handlers = set() # tasks of the connections
+        self._servers = []
+        self._loop = None
+
+    async def start_tcp(self, host = "127.0.0.1", port = 0):
+        """
+        Accepts clients on a TCP port (0: any free port), returns the asyncio.Server
+        """
+        self._loop = asyncio.get_running_loop()
+        server = await asyncio.start_server(self._handle, host, port)
+        self._servers.append(server)
+        return server
+
+    async def start_unix(self, path):
+        """
+        Accepts clients on a Unix socket, returns the asyncio.Server
+        """
+        self._loop = asyncio.get_running_loop()
+        server = await asyncio.start_unix_server(self._handle, path)
+        self._servers.append(server)
+        return server
+
+    def follow(self, filepath, channel = None, start = "end", interval = 0.005, **filter_kw):
+        """
+        Publishes the profiles of a BDD file being recorded, filtered in a background thread by a LiveFilter
+
+        Must be called from a coroutine or callback of the event loop.
+
+        Arguments
+        ---------
+
+        filepath, channel, start, interval --> see pipeline.LiveFilter
+        filter_kw --> start_id_depth, threshold, interpolation_method, detector, window, n_sigma, epsilon of the
+                      filter and keyword arguments of DOPpy.DOP, see pipeline.LiveFilter
+        """
+        self._loop = asyncio.get_running_loop()
+        self.live = LiveFilter(filepath, channel, callback=self.publish_threadsafe, start=start, interval=interval, **filter_kw)
+        if self.depth is None:
+            self.depth = self.live.depth
+        self.live.start()
+        return self.live
+
+    def publish(self, t, profile):
+        """
+        Queues the profile at time t for all clients, must be called from the thread of the event loop
+        """
+        frame = pack_frame(t, profile)
+        self.frames += 1
+        limit = self.buffer_frames*len(frame)
+        for writer in list(self._clients):
+            if writer.transport.get_write_buffer_size() + len(frame) > limit:
+                self._drop(writer)
+            else:
+                writer.write(frame)
+
+    def publish_threadsafe(self, t, profile, is_outlier = None):
+        """
+        Same as publish, from any thread (accepts the arguments of the LiveFilter callback)
+        """
+        self._loop.call_soon_threadsafe(self.publish, t, profile)
+
+    @property
+    def clients(self):
+        """
+        Number of connected clients
+        """
+        return len(self._clients)
+
+    def _drop(self, writer):
+        """
+        Disconnects a client without sending its waiting frames
+        """
+        self._clients.discard(writer)
+        self.dropped_clients += 1
+        writer.transport.abort()
+
+    async def _handle(self, reader, writer):
+        """
+        Registers a client until it is dropped or disconnects, the frames are written by publish
+        """
+        if self.depth is not None:
+            writer.write(pack_frame(np.nan, self.depth))
+        self._clients.add(writer)
+        self._handlers.add(asyncio.current_task())
+        try:
+            # clients do not send data, the end of the stream is the disconnection
+            while await reader.read(4096):
+                pass
+        except ConnectionError:
+            pass
+        finally:
+            self._clients.discard(writer)
+            self._handlers.discard(asyncio.current_task())
+            writer.close()
+
+    async def close(self):
+        """
+        Stops following the file, closes the servers and disconnects all clients, raises the error that ended the
+        filter thread if there was one (see pipeline.LiveFilter.stop)
+        """
+        live, self.live = self.live, None
+        try:
+            if live is not None:
+                live.stop()
+        finally:
+            for server in self._servers:
+                server.close()
+            for writer in list(self._clients):
+                # the waiting frames are still sent
+                self._clients.discard(writer)
+                writer.close()
+            await asyncio.gather(*self._handlers, return_exceptions=True)
+            for server in self._servers:
+                await server.wait_closed()
+            self._servers = []
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description="Streams the filtered velocity of a BDD file being recorded")
+    parser.add_argument("filepath", help="BDD file being recorded")
+    parser.add_argument("--replay", action="store_true", help="simulates the recording of the file in a temporary file")
+    parser.add_argument("--speed", type=float, default=1.0, help="speed factor of --replay")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--unix", default=None, help="path of a Unix socket used instead of TCP")
+    parser.add_argument("--channel", type=int, default=None)
+    parser.add_argument("--threshold", default="70", help="threshold in mm/s or auto")
+    parser.add_argument("--interpolation", default="linear")
+    parser.add_argument("--detector", default="jump")
+    parser.add_argument("--start-id-depth", type=int, default=0)
+    parser.add_argument("--buffer-frames", type=int, default=64)
+    args = parser.parse_args(argv)
+    threshold = args.threshold if args.threshold == "auto" else float(args.threshold)
+
+    filepath, start = args.filepath, "end"
+    if args.replay:
+        # all profiles of the simulated recording are streamed
+        tmp_dir = tempfile.mkdtemp()
+        filepath, start = os.path.join(tmp_dir, os.path.basename(args.filepath)), "begin"
+
+    async def serve():
+        server = ProfileServer(buffer_frames=args.buffer_frames)
+        if args.unix is not None:
+            await server.start_unix(args.unix)
+        else:
+            await server.start_tcp(args.host, args.port)
+        if args.replay:
+            replay = start_replay(args.filepath, filepath, args.speed)
+        server.follow(filepath, args.channel, start=start, start_id_depth=args.start_id_depth, threshold=threshold,
+                      interpolation_method=args.interpolation, detector=args.detector)
+        try:
+            while True:
+                await asyncio.sleep(3600)
+        finally:
+            await server.close()
+            if args.replay:
+                replay[1].set()
+                replay[0].join()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if args.replay:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,253 @@
+"""
+Streaming statistics of UDV profiles per depth gate
+
+ProfileStatistics is updated with chunks of (filtered) profiles of the form data[depth, time] and keeps only a fixed
+number of values per gate, so a whole measurement is processed in one pass with O(gates) memory:
+
+- count, mean, variance and skewness from the central moments, merged chunk by chunk (Welford/Chan update)
+- minimum and maximum
+- approximate percentiles with the P-square algorithm (Jain & Chlamtac, 1985), five markers per gate and percentile
+
+NaN values (e.g. outliers removed with interpolation_method "none") are ignored.
+"""
+import numpy as np
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+def _p2_update_numpy(data, q, pos, desired, inc, seen):
+    """
+    P-square update of the markers with the profiles data[depth, time], vectorised over the gates and percentiles
+
+    q, pos, desired --> marker heights, positions and desired positions of the form [percentile, depth, 5]
+    inc --> increments of the desired positions of the form [percentile, 5]
+    seen --> number of values per gate, the first 5 values of a gate are stored in q
+    """
+    n_p = q.shape[0]
+    for x in data.T:
+        valid = ~np.isnan(x)
+        # the first five values of a gate initialise the markers
+        init = valid & (seen < 5)
+        if init.any():
+            g = np.flatnonzero(init)
+            q[:, g, seen[g]] = x[g]
+            seen[g] += 1
+            full = g[seen[g] == 5]
+            q[:, full, :] = np.sort(q[:, full, :], axis=2)
+        g = np.flatnonzero(valid & ~init)
+        if len(g) == 0:
+            continue
+        seen[g] += 1
+        xg = np.broadcast_to(x[g], (n_p, len(g)))
+        qg = q[:, g, :]
+        pg = pos[:, g, :]
+        # cell k of the new value, the extreme markers are moved to new extremes
+        qg[:, :, 0] = np.minimum(qg[:, :, 0], xg)
+        qg[:, :, 4] = np.maximum(qg[:, :, 4], xg)
+        k = np.clip((xg[:, :, None] >= qg[:, :, 1:4]).sum(axis=2), 0, 3)
+        pg += np.arange(5) > k[:, :, None]
+        dg = desired[:, g, :] + inc[:, None, :]
+        desired[:, g, :] = dg
+        for i in range(1, 4):
+            d = dg[:, :, i] - pg[:, :, i]
+            up = (d >= 1) & (pg[:, :, i+1] - pg[:, :, i] > 1)
+            down = (d <= -1) & (pg[:, :, i-1] - pg[:, :, i] < -1)
+            move = up | down
+            if not move.any():
+                continue
+            s = np.where(up, 1.0, -1.0)
+            n_l, n_i, n_r = pg[:, :, i-1], pg[:, :, i], pg[:, :, i+1]
+            q_l, q_i, q_r = qg[:, :, i-1], qg[:, :, i], qg[:, :, i+1]
+            # piecewise parabolic prediction, linear if it leaves the neighbours
+            parabolic = q_i + s/(n_r-n_l)*((n_i-n_l+s)*(q_r-q_i)/(n_r-n_i) + (n_r-n_i-s)*(q_i-q_l)/(n_i-n_l))
+            n_s = np.where(up, n_r, n_l)
+            q_s = np.where(up, q_r, q_l)
+            linear = q_i + s*(q_s-q_i)/(n_s-n_i)
+            new = np.where((q_l < parabolic) & (parabolic < q_r), parabolic, linear)
+            qg[:, :, i] = np.where(move, new, q_i)
+            pg[:, :, i] = np.where(move, n_i+s, n_i)
+        q[:, g, :] = qg
+        pos[:, g, :] = pg
+
+def _p2_update_loop(data, q, pos, desired, inc, seen):
+    """
+    Loop version of _p2_update_numpy, compiled with numba if available
+    """
+    for t in range(data.shape[1]):
+        for g in range(data.shape[0]):
+            x = data[g, t]
+            if np.isnan(x):
+                continue
+            if seen[g] < 5:
+                for j in range(q.shape[0]):
+                    q[j, g, seen[g]] = x
+                    if seen[g] == 4:
+                        q[j, g, :] = np.sort(q[j, g, :])
+                seen[g] += 1
+                continue
+            seen[g] += 1
+            for j in range(q.shape[0]):
+                if x < q[j, g, 0]:
+                    q[j, g, 0] = x
+                if x > q[j, g, 4]:
+                    q[j, g, 4] = x
+                k = 0
+                while k < 3 and x >= q[j, g, k+1]:
+                    k += 1
+                for i in range(k+1, 5):
+                    pos[j, g, i] += 1
+                for i in range(5):
+                    desired[j, g, i] += inc[j, i]
+                for i in range(1, 4):
+                    d = desired[j, g, i] - pos[j, g, i]
+                    if (d >= 1 and pos[j, g, i+1] - pos[j, g, i] > 1) or (d <= -1 and pos[j, g, i-1] - pos[j, g, i] < -1):
+                        s = 1.0 if d >= 1 else -1.0
+                        n_l, n_i, n_r = pos[j, g, i-1], pos[j, g, i], pos[j, g, i+1]
+                        q_l, q_i, q_r = q[j, g, i-1], q[j, g, i], q[j, g, i+1]
+                        new = q_i + s/(n_r-n_l)*((n_i-n_l+s)*(q_r-q_i)/(n_r-n_i) + (n_r-n_i-s)*(q_i-q_l)/(n_i-n_l))
+                        if not (q_l < new < q_r):
+                            if s > 0:
+                                new = q_i + (q_r-q_i)/(n_r-n_i)
+                            else:
+                                new = q_i - (q_l-q_i)/(n_l-n_i)
+                        q[j, g, i] = new
+                        pos[j, g, i] = n_i + s
+
+if njit is not None:
+    _p2_update_loop = njit(cache=True)(_p2_update_loop)
+
+class ProfileStatistics:
+    """
+    Single pass statistics of UDV profiles per depth gate, see the module docstring
+    """
+    def __init__(self, n_gates, percentiles = (5, 25, 50, 75, 95), kernel = "auto"):
+        """
+        Arguments
+        ---------
+
+        n_gates --> number of depth gates of the profiles
+        percentiles --> percentiles (0 to 100) that are estimated
+        kernel --> "numba", "numpy" or "auto" (numba if installed), implementation of the percentile update
+        """
+        if kernel == "auto":
+            kernel = "numpy" if njit is None else "numba"
+        if kernel not in ("numba", "numpy"):
+            raise ValueError("Unknown kernel %r" % kernel)
+        if kernel == "numba" and njit is None:
+            raise ImportError("numba is not installed")
+        self.kernel = kernel
+
+        self.count = np.zeros(n_gates, dtype=np.int64)
+        self._mean = np.zeros(n_gates)
+        self._m2 = np.zeros(n_gates) # sums of the squared and cubed deviations from the mean
+        self._m3 = np.zeros(n_gates)
+        self.min = np.full(n_gates, np.nan)
+        self.max = np.full(n_gates, np.nan)
+
+        self.percentiles = np.atleast_1d(np.asarray(percentiles, dtype=float))
+        p = self.percentiles[:, None]/100
+        self._q = np.zeros((len(p), n_gates, 5))
+        self._pos = np.tile(np.arange(1.0, 6.0), (len(p), n_gates, 1))
+        self._desired = np.tile((np.hstack([1+0*p, 1+2*p, 1+4*p, 3+2*p, 5+0*p]))[:, None, :], (1, n_gates, 1))
+        self._inc = np.hstack([0*p, p/2, p, (1+p)/2, 1+0*p])
+        self._seen = np.zeros(n_gates, dtype=np.int64)
+
+    def update(self, data):
+        """
+        Adds a chunk of profiles
+
+        Arguments
+        ---------
+
+        data --> 2D array of the form data[depth, time] (or 1D array of one profile)
+        """
+        data = np.asarray(data, dtype=float)
+        if data.ndim == 1:
+            data = data[:, None]
+
+        # central moments of the chunk, merged with the moments so far
+        n_b = np.sum(~np.isnan(data), axis=1)
+        has = n_b > 0
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean_b = np.where(has, np.nansum(data, axis=1)/n_b, 0.0)
+            dev = data - mean_b[:, None]
+            m2_b = np.nansum(dev**2, axis=1)
+            m3_b = np.nansum(dev**3, axis=1)
+            n_a = self.count
+            n = n_a + n_b
+            delta = mean_b - self._mean
+            w = np.where(n > 0, n_b/np.maximum(n, 1), 0.0)
+            self._mean = self._mean + delta*w
+            m2 = self._m2 + m2_b + delta**2*n_a*w
+            self._m3 = self._m3 + m3_b + np.where(n > 0, delta**3*n_a*n_b*(n_a-n_b)/np.maximum(n, 1)**2
+                                                  + 3*delta*(n_a*m2_b - n_b*self._m2)/np.maximum(n, 1), 0.0)
+            self._m2 = m2
+        self.count = n
+        self.min = np.fmin(self.min, np.nanmin(np.where(has[:, None], data, np.inf), axis=1))
+        self.max = np.fmax(self.max, np.nanmax(np.where(has[:, None], data, -np.inf), axis=1))
+        self.min[self.count == 0] = np.nan
+        self.max[self.count == 0] = np.nan
+
+        if self.kernel == "numba":
+            _p2_update_loop(np.ascontiguousarray(data), self._q, self._pos, self._desired, self._inc, self._seen)
+        else:
+            _p2_update_numpy(data, self._q, self._pos, self._desired, self._inc, self._seen)
+        return self
+
+    def mean(self):
+        """
+        Mean per gate (NaN for gates without values)
+        """
+        return np.where(self.count > 0, self._mean, np.nan)
+
+    def variance(self, ddof = 0):
+        """
+        Variance per gate (ddof as in numpy.var)
+        """
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(self.count > ddof, self._m2/(self.count-ddof), np.nan)
+
+    def std(self, ddof = 0):
+        """
+        Standard deviation per gate, the RMS of the velocity fluctuations
+        """
+        return np.sqrt(self.variance(ddof))
+
+    def rms(self):
+        """
+        Root mean square of the values per gate
+        """
+        return np.sqrt(self.mean()**2 + self.variance())
+
+    def skewness(self):
+        """
+        Skewness per gate (biased estimator, as scipy.stats.skew)
+        """
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.sqrt(self.count)*self._m3/self._m2**1.5
+
+    def percentile(self, p):
+        """
+        Estimated percentile per gate, p must be one of the percentiles given at construction
+
+        Gates with less than 5 values return the exact percentile of their values.
+        """
+        j = np.flatnonzero(self.percentiles == p)
+        if len(j) == 0:
+            raise ValueError("Percentile %r is not estimated, available: %s" % (p, list(self.percentiles)))
+        result = self._q[j[0], :, 2].copy()
+        for g in np.flatnonzero(self._seen < 5):
+            values = self._q[j[0], g, :self._seen[g]]
+            result[g] = np.percentile(values, p) if len(values) else np.nan
+        return result
+
+    def summary(self):
+        """
+        Dictionary of all statistics per gate
+        """
+        result = {"count": self.count.copy(), "mean": self.mean(), "variance": self.variance(), "std": self.std(),
+                  "rms": self.rms(), "skewness": self.skewness(), "min": self.min.copy(), "max": self.max.copy()}
+        for p in self.percentiles:
+            result["p%g" % p] = self.percentile(p)
+        return result